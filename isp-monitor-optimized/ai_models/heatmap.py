@@ -0,0 +1,144 @@
+import os
+import glob
+import time
+import threading
+import cv2
+import numpy as np
+
+GRID_SHAPE = (36, 64)  # rows, cols (16:9 cells)
+BUCKET_SECONDS = 3600  # one accumulator grid pair per camera per hour
+MAX_FRAME_GAP = 2.0  # seconds; longer gaps (stream drop) are not counted as dwell
+
+
+class HeatmapEngine:
+    def __init__(self, root='analytics/heatmaps', grid_shape=GRID_SHAPE,
+                 bucket_seconds=BUCKET_SECONDS, memory_buckets=24):
+        """Incremental per-camera occupancy/dwell grids for ISP vehicles"""
+        self.root = root
+        self.grid_shape = grid_shape
+        self.bucket_seconds = bucket_seconds
+        self.memory_buckets = memory_buckets
+        self.buckets = {}  # camera_id -> {bucket_start: {'hits', 'dwell'}}
+        self.last_seen = {}
+        self.dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _bucket(self, camera_id, bucket_start):
+        camera = self.buckets.setdefault(camera_id, {})
+        grids = camera.get(bucket_start)
+        if grids is None:
+            grids = self._load(camera_id, bucket_start) or {
+                'hits': np.zeros(self.grid_shape, dtype=np.float32),
+                'dwell': np.zeros(self.grid_shape, dtype=np.float32)
+            }
+            camera[bucket_start] = grids
+        return grids
+
+    def update(self, camera_id, detections, frame_shape, now=None):
+        """Accumulate one analysed frame; cost is O(len(detections))"""
+        now = now if now is not None else time.time()
+        last = self.last_seen.get(camera_id)
+        self.last_seen[camera_id] = now
+        if len(detections) == 0:
+            return
+
+        dt = min(now - last, MAX_FRAME_GAP) if last is not None else 0
+        rows, cols = self.grid_shape
+        height, width = frame_shape[:2]
+
+        # Ground contact point (bottom centre) of each box
+        bbox = detections['bbox']
+        cx = ((bbox[:, 0] + bbox[:, 2]) * (cols / (2.0 * width))).astype(np.intp)
+        cy = (bbox[:, 3] * (rows / float(height))).astype(np.intp)
+        np.clip(cx, 0, cols - 1, out=cx)
+        np.clip(cy, 0, rows - 1, out=cy)
+
+        bucket_start = int(now // self.bucket_seconds) * self.bucket_seconds
+        with self._lock:
+            grids = self._bucket(camera_id, bucket_start)
+            np.add.at(grids['hits'], (cy, cx), 1)
+            if dt > 0:
+                np.add.at(grids['dwell'], (cy, cx), dt)
+            self.dirty.add((camera_id, bucket_start))
+
+    def query(self, camera_id, start, end, kind='dwell'):
+        """Sum of a camera's grids whose bucket falls in [start, end)"""
+        first = int(start // self.bucket_seconds) * self.bucket_seconds
+        total = np.zeros(self.grid_shape, dtype=np.float32)
+        with self._lock:
+            # Copied under the lock: update() mutates live grids in place
+            in_memory = {bucket_start: grids[kind].copy()
+                         for bucket_start, grids in self.buckets.get(camera_id, {}).items()
+                         if first <= bucket_start < end}
+
+        for grid in in_memory.values():
+            total += grid
+        for bucket_start in self._stored_buckets(camera_id) - set(in_memory):
+            if first <= bucket_start < end:
+                grids = self._load(camera_id, bucket_start)
+                if grids:
+                    total += grids[kind]
+        return total
+
+    def render_png(self, grid, size=(640, 360)):
+        """Render an accumulator grid as a colour-mapped PNG (bytes)"""
+        scaled = np.log1p(grid)
+        peak = scaled.max()
+        if peak > 0:
+            scaled = scaled * (255.0 / peak)
+        image = cv2.applyColorMap(scaled.astype(np.uint8), cv2.COLORMAP_JET)
+        image = cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
+        ok, encoded = cv2.imencode('.png', image)
+        if not ok:
+            raise RuntimeError("Failed to encode heatmap PNG")
+        return encoded.tobytes()
+
+    # --- Persistence ---
+
+    def _path(self, camera_id, bucket_start):
+        return os.path.join(self.root, str(camera_id), f"{bucket_start}.npz")
+
+    def _stored_buckets(self, camera_id):
+        pattern = os.path.join(self.root, glob.escape(str(camera_id)), '*.npz')
+        names = (os.path.basename(p)[:-4] for p in glob.glob(pattern))
+        return {int(name) for name in names if name.isdigit()}
+
+    def _load(self, camera_id, bucket_start):
+        path = self._path(camera_id, bucket_start)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return {'hits': data['hits'], 'dwell': data['dwell']}
+
+    def persist(self):
+        """Write dirty buckets to disk and evict old ones from memory"""
+        with self._lock:
+            dirty = {key: {k: v.copy() for k, v in self.buckets[key[0]][key[1]].items()}
+                     for key in self.dirty}
+            self.dirty.clear()
+
+        for (camera_id, bucket_start), grids in dirty.items():
+            path = self._path(camera_id, bucket_start)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path[:-4] + '.tmp.npz'
+            np.savez_compressed(tmp_path, **grids)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            for camera_id, camera in self.buckets.items():
+                for bucket_start in sorted(camera)[:-self.memory_buckets]:
+                    if (camera_id, bucket_start) not in self.dirty:
+                        del camera[bucket_start]
+
+    def start_periodic(self, interval=60):
+        """Persist every interval seconds in a daemon thread"""
+        def run():
+            while not self._stop.wait(interval):
+                self.persist()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self.persist()
@@ -50,9 +50,13 @@ class LogoRecognizer:
             image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
         return self.transform(image).unsqueeze(0).to(self.device)
 
-    def predict(self, vehicle_crop):
-        """Predict if vehicle belongs to target ISP"""
+    def predict_proba(self, vehicle_crop):
+        """Probability that vehicle belongs to target ISP"""
         with torch.no_grad():
             inputs = self.preprocess(vehicle_crop)
             outputs = self.model(inputs)
-            return outputs.squeeze().item() > 0.5  # Returns True if ISP vehicle
\ No newline at end of file
+            return outputs.view(-1)[-1].item()  # Last output unit = ISP vehicle
+
+    def predict(self, vehicle_crop):
+        """Predict if vehicle belongs to target ISP"""
+        return self.predict_proba(vehicle_crop) > 0.5  # Returns True if ISP vehicle
\ No newline at end of file
@@ -1,17 +1,51 @@
 import cv2
 import time
+import threading
+import numpy as np
 from ai_models.vehicle_detection import VehicleDetector
+from ai_models.vehicle_detection_core import VehicleDetectorCore
 from ai_models.logo_recognition import LogoRecognizer
 
+DEFAULT_IMGSZ = 640  # YOLO inference size when none is given
+MIN_CROP_IMGSZ = 160  # smallest inference size for escalated crops
+
 class DetectionPipeline:
-    def __init__(self, vehicle_model='yolov8n.pt', logo_model=None):
+    def __init__(self, vehicle_model='yolov8n.pt', logo_model=None, cascade=False,
+                 escalation_model='yolov8m.pt', min_conf=0.15, escalation_conf=0.5,
+                 isp_band=(0.3, 0.7), region_padding=0.15, max_region_fraction=0.5,
+                 max_escalated_boxes=4, duplicate_iou=0.5):
         self.vehicle_detector = VehicleDetector(vehicle_model)
         self.logo_recognizer = LogoRecognizer(logo_model)
         self.frame_count = 0
         self.fps = 0
         self.last_time = time.time()
+        self.memory_probe = None  # optional callable(stage, arrays) for buffer accounting
+
+        # Cascade: nano on every frame, medium only where nano is unsure
+        self.cascade = cascade
+        self.escalation_model = escalation_model
+        self.escalation_detector = None  # loaded on first escalation
+        self.min_conf = min_conf
+        self.escalation_conf = escalation_conf
+        self.isp_band = isp_band
+        self.region_padding = region_padding
+        self.max_region_fraction = max_region_fraction
+        self.max_escalated_boxes = max_escalated_boxes
+        self.duplicate_iou = duplicate_iou
+        self.cascade_stats = {
+            'frames': 0,
+            'escalated_frames': 0,
+            'escalated_boxes': 0,
+            'crop_escalations': 0,
+            'full_escalations': 0,
+            'low_conf_boxes': 0,
+            'uncertain_isp_boxes': 0
+        }
+        # The pipeline is shared by all camera worker threads
+        self._stats_lock = threading.Lock()
+        self._load_lock = threading.Lock()
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, imgsz=None, check_logos=True):
         """Process single frame through detection pipeline"""
         # Calculate FPS
         self.frame_count += 1
@@ -20,24 +54,24 @@ class DetectionPipeline:
             self.frame_count = 0
             self.last_time = time.time()
 
-        # Vehicle detection
-        vehicles = self.vehicle_detector.detect(frame)
-        isp_vehicles = []
-        
-        # Logo recognition on detected vehicles
-        for vehicle in vehicles:
-            x1, y1, x2, y2 = vehicle['bbox']
-            vehicle_crop = frame[y1:y2, x1:x2]
-            
-            if vehicle_crop.size > 0:  # Ensure valid crop
-                is_isp = self.logo_recognizer.predict(vehicle_crop)
-                if is_isp:
-                    vehicle['is_isp'] = True
-                    isp_vehicles.append(vehicle)
-                    # Draw special marking for ISP vehicles
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
-                    cv2.putText(frame, "ISP VEHICLE", (x1, y1-30),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,0,255), 2)
+        # Vehicle detection (DETECTION_DTYPE structured array)
+        if self.cascade:
+            vehicles = self._detect_cascade(frame, imgsz, check_logos)
+        else:
+            vehicles = self.vehicle_detector.detect(frame, imgsz=imgsz)
+            # Logo recognition on detected vehicles (skipped when degraded)
+            if check_logos:
+                self._recognize_logos(frame, vehicles)
+
+        isp_vehicles = vehicles[vehicles['is_isp']]
+        if self.memory_probe is not None:
+            self.memory_probe('frame', frame)
+            self.memory_probe('detections', vehicles)
+        for x1, y1, x2, y2 in isp_vehicles['bbox'].tolist():
+            # Draw special marking for ISP vehicles
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+            cv2.putText(frame, "ISP VEHICLE", (x1, y1-30),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,0,255), 2)
 
         # Draw all detections
         frame = self.vehicle_detector.draw_detections(frame, vehicles)
@@ -48,6 +82,151 @@ class DetectionPipeline:
         
         return frame, isp_vehicles
 
+    def _logo_probabilities(self, frame, vehicles):
+        """ISP probability per vehicle (0 for empty crops)"""
+        probabilities = np.zeros(len(vehicles), dtype=np.float32)
+        for i, (x1, y1, x2, y2) in enumerate(vehicles['bbox'].tolist()):
+            vehicle_crop = frame[y1:y2, x1:x2]
+            if vehicle_crop.size > 0:  # Ensure valid crop
+                probabilities[i] = self.logo_recognizer.predict_proba(vehicle_crop)
+        return probabilities
+
+    def _recognize_logos(self, frame, vehicles):
+        vehicles['is_isp'] = self._logo_probabilities(frame, vehicles) > 0.5
+
+    def _detect_cascade(self, frame, imgsz, check_logos):
+        """Nano detection, escalating unsure boxes to the medium model"""
+        vehicles = self.vehicle_detector.detect(frame, imgsz=imgsz, conf=self.min_conf)
+        low_conf = vehicles['confidence'] < self.escalation_conf
+        uncertain_isp = np.zeros(len(vehicles), dtype=bool)
+
+        # Logo check only on confident boxes; borderline scores also escalate
+        if check_logos and len(vehicles):
+            confident = ~low_conf
+            probabilities = np.zeros(len(vehicles), dtype=np.float32)
+            probabilities[confident] = self._logo_probabilities(frame, vehicles[confident])
+            low, high = self.isp_band
+            uncertain_isp = confident & (probabilities >= low) & (probabilities <= high)
+            vehicles['is_isp'] = probabilities > 0.5
+
+        # Uncertain ISP boxes first, then the most confident low boxes. Past the
+        # cap nano's answer stands and low confidence boxes are dropped
+        escalate = low_conf | uncertain_isp
+        order = np.lexsort((-vehicles['confidence'], ~uncertain_isp))
+        selected = order[escalate[order]][:self.max_escalated_boxes]
+        self._count(frames=1, low_conf_boxes=int(low_conf.sum()),
+                    uncertain_isp_boxes=int(uncertain_isp.sum()),
+                    escalated_frames=int(len(selected) > 0), escalated_boxes=len(selected))
+        if not len(selected):
+            return vehicles
+
+        refined = self._escalate(frame, vehicles['bbox'][selected], imgsz)
+        # Medium's box replaces an escalated nano box it matches. Confident boxes
+        # medium did not re-detect keep nano's answer; low confidence ones drop
+        replaced = escalate & self._overlaps(vehicles['bbox'], refined['bbox'])
+        kept = vehicles[~replaced & ~low_conf]
+
+        # Medium re-detections of kept nano boxes are duplicates, already classified
+        refined = refined[~self._overlaps(refined['bbox'], kept['bbox'])]
+        if check_logos:
+            self._recognize_logos(frame, refined)
+        return np.concatenate([kept, refined])
+
+    def _escalate(self, frame, boxes, imgsz):
+        """Medium model on padded per-box crops, in frame coordinates.
+
+        Crops run at the frame's inference scale, so their cost is roughly
+        their letterboxed area. When the crops together would cost more than
+        max_region_fraction of a full-frame pass, the full frame runs once.
+        """
+        detector = self._escalation_model()
+        height, width = frame.shape[:2]
+        full_size = imgsz or DEFAULT_IMGSZ
+        scale = full_size / max(height, width)
+
+        crops = [self._crop_box(frame.shape, box) for box in boxes.tolist()]
+        sizes = [self._round_stride(max(x2 - x1, y2 - y1) * scale) for x1, y1, x2, y2 in crops]
+        sizes = [min(full_size, max(MIN_CROP_IMGSZ, size)) for size in sizes]
+        full_cost = full_size * full_size * min(height, width) / max(height, width)
+        if sum(size * size for size in sizes) > self.max_region_fraction * full_cost:
+            self._count(full_escalations=1)
+            return detector.detect(frame, imgsz=imgsz)
+
+        self._count(crop_escalations=len(crops))
+        results = []
+        for (x1, y1, x2, y2), size in zip(crops, sizes):
+            region = frame[y1:y2, x1:x2]
+            if self.memory_probe is not None:
+                self.memory_probe('escalation_region', region)
+            refined = detector.detect(region, imgsz=size)
+            refined['bbox'] += np.array([x1, y1, x1, y1], dtype=np.int32)
+            results.append(refined)
+        # Overlapping crops can see the same vehicle twice
+        return self._dedupe(np.concatenate(results))
+
+    def _escalation_model(self):
+        # Loaded once on first escalation, even with several workers escalating
+        if self.escalation_detector is None:
+            with self._load_lock:
+                if self.escalation_detector is None:
+                    self.escalation_detector = VehicleDetectorCore(
+                        self.escalation_model, conf_threshold=self.escalation_conf)
+        return self.escalation_detector
+
+    def _crop_box(self, shape, box):
+        """Padded box, clipped to the frame"""
+        height, width = shape[:2]
+        x1, y1, x2, y2 = box
+        pad_x = int((x2 - x1) * self.region_padding) + 16
+        pad_y = int((y2 - y1) * self.region_padding) + 16
+        return (max(x1 - pad_x, 0), max(y1 - pad_y, 0),
+                min(x2 + pad_x, width), min(y2 + pad_y, height))
+
+    @staticmethod
+    def _round_stride(size, stride=32):
+        return -(-int(size) // stride) * stride
+
+    @staticmethod
+    def _iou(a, b):
+        """Pairwise IoU of (N, 4) and (M, 4) box arrays"""
+        a = a.astype(np.float32)[:, None]
+        b = b.astype(np.float32)[None]
+        inter_w = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+        inter_h = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+        inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+        area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+        area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+        return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+    def _overlaps(self, boxes, others):
+        """Mask of boxes matching any of others (IoU >= duplicate_iou)"""
+        if not len(boxes) or not len(others):
+            return np.zeros(len(boxes), dtype=bool)
+        return (self._iou(boxes, others) >= self.duplicate_iou).any(axis=1)
+
+    def _dedupe(self, records):
+        """Greedy NMS across crops, keeping the most confident box"""
+        records = records[np.argsort(-records['confidence'], kind='stable')]
+        iou = self._iou(records['bbox'], records['bbox'])
+        keep = np.ones(len(records), dtype=bool)
+        for i in range(len(records)):
+            if keep[i]:
+                keep[i + 1:] &= iou[i, i + 1:] < self.duplicate_iou
+        return records[keep]
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.cascade_stats[key] += value
+
+    def get_cascade_stats(self):
+        """Escalation counters and rate for the cascade mode"""
+        with self._stats_lock:
+            stats = dict(self.cascade_stats, enabled=self.cascade)
+        stats['escalation_rate'] = (stats['escalated_frames'] / stats['frames']
+                                    if stats['frames'] else 0)
+        return stats
+
     def process_video(self, video_source=0):
         """Process video stream from camera"""
         cap = cv2.VideoCapture(video_source)
@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import deque
+
+# Quality ladder, from full quality (0) to the most degraded level.
+# analysis_fps=None means every frame read from the stream is analysed.
+QUALITY_LEVELS = [
+    {'analysis_fps': None, 'imgsz': 640, 'logo_every': 1},
+    {'analysis_fps': 10, 'imgsz': 640, 'logo_every': 2},
+    {'analysis_fps': 5, 'imgsz': 480, 'logo_every': 3},
+    {'analysis_fps': 2, 'imgsz': 320, 'logo_every': 5},
+]
+
+DEFAULT_PRIORITY = 1  # Higher value = more important camera
+
+
+class QualityController:
+    def __init__(self, target_latency_ms=500, headroom=0.7, cooldown=5.0,
+                 smoothing=0.2, levels=None, history=200):
+        """Feedback controller that trades per-camera quality for latency"""
+        self.target_latency = target_latency_ms / 1000.0
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.levels = levels or QUALITY_LEVELS
+        self.cameras = {}
+        self.decisions = deque(maxlen=history)
+        self._last_change = 0
+        self._lock = threading.Lock()
+
+    def register_camera(self, camera_id, priority=DEFAULT_PRIORITY):
+        """Start tracking a camera, keeping its state if already known"""
+        with self._lock:
+            state = self.cameras.setdefault(camera_id, {
+                'level': 0,
+                'latency': 0,
+                'frames': 0,
+                'last_analyzed': 0
+            })
+            state['priority'] = priority
+
+    def unregister_camera(self, camera_id):
+        """Stop tracking a camera"""
+        with self._lock:
+            self.cameras.pop(camera_id, None)
+
+    def settings_for(self, camera_id):
+        """Return the quality settings currently applied to a camera"""
+        state = self.cameras.get(camera_id)
+        return self.levels[state['level'] if state else 0]
+
+    def should_analyze(self, camera_id, now=None):
+        """Return True if this frame fits the camera's analysis fps budget"""
+        state = self.cameras.get(camera_id)
+        if state is None:
+            return True
+
+        fps = self.levels[state['level']]['analysis_fps']
+        now = now if now is not None else time.time()
+        if fps and now - state['last_analyzed'] < 1.0 / fps:
+            return False
+
+        state['last_analyzed'] = now
+        return True
+
+    def should_check_logos(self, camera_id):
+        """Return True if logo recognition should run on this analysed frame"""
+        state = self.cameras.get(camera_id)
+        if state is None:
+            return True
+        return state['frames'] % self.levels[state['level']]['logo_every'] == 0
+
+    def record(self, camera_id, latency):
+        """Feed an end-to-end latency sample (seconds) and adjust quality"""
+        with self._lock:
+            state = self.cameras.get(camera_id)
+            if state is None:
+                return
+
+            state['frames'] += 1
+            if state['latency'] == 0:
+                state['latency'] = latency
+            else:
+                state['latency'] += self.smoothing * (latency - state['latency'])
+
+            self._adjust(time.time())
+
+    def _adjust(self, now):
+        """Degrade low priority cameras first, restore high priority first"""
+        if now - self._last_change < self.cooldown or not self.cameras:
+            return
+
+        worst = max(s['latency'] for s in self.cameras.values())
+
+        if worst > self.target_latency:
+            # Lowest priority camera, least degraded first so peers step down together
+            candidates = [(s['priority'], s['level'], cid)
+                          for cid, s in self.cameras.items()
+                          if s['level'] < len(self.levels) - 1]
+            if candidates:
+                _, _, camera_id = min(candidates)
+                self._change(camera_id, +1, worst, now)
+
+        elif worst < self.target_latency * self.headroom:
+            # Highest priority camera, most degraded first so peers recover together
+            candidates = [(-s['priority'], -s['level'], cid)
+                          for cid, s in self.cameras.items()
+                          if s['level'] > 0]
+            if candidates:
+                _, _, camera_id = min(candidates)
+                self._change(camera_id, -1, worst, now)
+
+    def _change(self, camera_id, step, worst, now):
+        state = self.cameras[camera_id]
+        old_level = state['level']
+        state['level'] = old_level + step
+        self._last_change = now
+        self.decisions.append({
+            'timestamp': now,
+            'camera_id': camera_id,
+            'action': 'degrade' if step > 0 else 'restore',
+            'from_level': old_level,
+            'to_level': state['level'],
+            'worst_latency_ms': worst * 1000,
+            'target_latency_ms': self.target_latency * 1000
+        })
+
+    def get_status(self):
+        """Return per-camera state and recent decisions for observability"""
+        with self._lock:
+            return {
+                'target_latency_ms': self.target_latency * 1000,
+                'cameras': {
+                    cid: {
+                        'priority': s['priority'],
+                        'level': s['level'],
+                        'latency_ms': s['latency'] * 1000,
+                        'frames': s['frames'],
+                        'settings': self.levels[s['level']]
+                    }
+                    for cid, s in self.cameras.items()
+                },
+                'decisions': list(self.decisions)
+            }
@@ -1,7 +1,6 @@
-import cv2
-import numpy as np
 import time
 from ultralytics import YOLO
+from ai_models.vehicle_detection_utils import VehicleDetectionUtils
 
 class VehicleDetectorCore:
     def __init__(self, model_path='yolov8m.pt', conf_threshold=0.5):
@@ -27,11 +26,15 @@ class VehicleDetectorCore:
             'last_processing_time': 0
         }
 
-    def detect(self, frame):
-        """Detect vehicles in a frame and return bounding boxes"""
+    def detect(self, frame, imgsz=None):
+        """Detect vehicles in a frame and return DETECTION_DTYPE records"""
         start_time = time.time()
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.model(frame_rgb)
+        # YOLO expects BGR ndarrays; class/confidence filtering runs in the model
+        kwargs = {'classes': list(self.classes), 'conf': self.conf_threshold, 'verbose': False}
+        if imgsz:
+            kwargs['imgsz'] = imgsz
+        results = self.model(frame, **kwargs)
+        vehicles = VehicleDetectionUtils.to_records(results)
         
         # Update performance metrics
         processing_time = time.time() - start_time
@@ -42,18 +45,6 @@ class VehicleDetectorCore:
             / self.metrics['total_frames']
         )
         
-        vehicles = []
-        for result in results:
-            for box in result.boxes:
-                if int(box.cls) in self.classes and float(box.conf) >= self.conf_threshold:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    vehicles.append({
-                        'bbox': [x1, y1, x2, y2],
-                        'confidence': float(box.conf),
-                        'class_id': int(box.cls),
-                        'class_name': self.classes[int(box.cls)]
-                    })
-        
         return vehicles
 
     def get_metrics(self):
@@ -1,16 +1,67 @@
 import cv2
+import numpy as np
+
+# Compact per-detection record used through the pipeline. Detections are
+# only converted to dicts at the DB/JSON boundary (see to_dicts).
+DETECTION_DTYPE = np.dtype([
+    ('bbox', np.int32, (4,)),
+    ('confidence', np.float32),
+    ('class_id', np.int16),
+    ('is_isp', np.bool_)
+])
 
 class VehicleDetectionUtils:
     @staticmethod
-    def draw_detections(frame, detections):
+    def to_records(results):
+        """Convert YOLO results into a DETECTION_DTYPE structured array"""
+        # boxes.data is (N, 6) [x1, y1, x2, y2, conf, cls], or (N, 7) with a
+        # track id before conf; one device->host copy per result.
+        arrays = [result.boxes.data.cpu().numpy() for result in results
+                  if result.boxes is not None and len(result.boxes)]
+        if not arrays:
+            return np.zeros(0, dtype=DETECTION_DTYPE)
+
+        data = np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+        records = np.zeros(len(data), dtype=DETECTION_DTYPE)
+        records['bbox'] = data[:, :4]
+        records['confidence'] = data[:, -2]
+        records['class_id'] = data[:, -1]
+        return records
+
+    @staticmethod
+    def to_dicts(records, class_names=None):
+        """Convert detection records to JSON/BSON friendly dicts"""
+        bboxes = records['bbox'].tolist()
+        # float32 -> float64 with 4 decimals, so 0.9 is stored as 0.9, not 0.8999999761581421
+        confidences = np.round(records['confidence'].astype(np.float64), 4).tolist()
+        class_ids = records['class_id'].tolist()
+        is_isp = records['is_isp'].tolist()
+
+        detections = []
+        for bbox, confidence, class_id, isp in zip(bboxes, confidences, class_ids, is_isp):
+            detection = {
+                'bbox': bbox,
+                'confidence': confidence,
+                'class_id': class_id,
+                'is_isp': isp
+            }
+            if class_names:
+                detection['class_name'] = class_names.get(class_id, str(class_id))
+            detections.append(detection)
+        return detections
+
+    @staticmethod
+    def draw_detections(frame, detections, class_names=None):
         """Draw detection boxes and labels on frame"""
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
+        class_names = class_names or {}
+        for (x1, y1, x2, y2), confidence, class_id in zip(
+                detections['bbox'].tolist(), detections['confidence'].tolist(),
+                detections['class_id'].tolist()):
             # Draw bounding box
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
             # Draw label
-            label = f"{det['class_name']} {det['confidence']:.2f}"
-            cv2.putText(frame, label, (x1, y1-10), 
+            label = f"{class_names.get(class_id, class_id)} {confidence:.2f}"
+            cv2.putText(frame, label, (x1, y1-10),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 2)
         return frame
 
@@ -0,0 +1,280 @@
+"""Modo ASGI do backend (Starlette + motor).
+
+Serve as mesmas rotas do app_fixed com handlers assíncronos. Cada conexão
+SSE em /api/alerts é apenas uma corrotina esperando numa fila; um único
+poller consulta o MongoDB e distribui os alertas para todos os clientes.
+
+Execução:
+    cd backend/api
+    uvicorn app_async:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import wraps
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Importações locais
+from auth import verify_token, is_account_locked, IP_RATE_LIMIT, USER_RATE_LIMIT
+from rate_limit import limiter
+from database_async import AsyncDetectionDatabase
+from ai_models.quality_controller import DEFAULT_PRIORITY
+from workers import start_camera, start_workers
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+ALERT_POLL_INTERVAL = float(os.getenv('ALERT_POLL_INTERVAL', '0.5'))
+ALERT_BATCH = 50
+SSE_KEEPALIVE = 15  # segundos
+SSE_QUEUE_SIZE = 100
+
+db = AsyncDetectionDatabase()
+
+
+def _to_json(value):
+    """Converte ObjectId/datetime para tipos serializáveis"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def json_response(data, status_code=200):
+    return JSONResponse(json.loads(json.dumps(data, default=_to_json)),
+                        status_code=status_code)
+
+
+def rate_limited(key, rate):
+    """Versão assíncrona de limiter.check: resposta 429 ou None"""
+    allowed, retry_after = limiter.hit(key, rate)
+    if allowed:
+        return None
+    return JSONResponse({
+        'error': 'rate_limited',
+        'message': f'Rate limit exceeded ({rate})'
+    }, status_code=429, headers={'Retry-After': str(math.ceil(retry_after))})
+
+
+def token_required(f):
+    """Versão assíncrona do decorator de auth.token_required"""
+    ip_rate = limiter.rate_for(f.__name__, IP_RATE_LIMIT)
+    user_rate = limiter.rate_for(f'{f.__name__}:user', USER_RATE_LIMIT)
+
+    @wraps(f)
+    async def decorated(request):
+        # Limite por IP, verificado antes da autenticação
+        client = request.client.host if request.client else 'unknown'
+        limited = rate_limited(f"{f.__name__}:{client}", ip_rate)
+        if limited is not None:
+            return limited
+
+        token = None
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+
+        if not token:
+            return JSONResponse({
+                'error': 'authentication_required',
+                'message': 'Token is missing'
+            }, status_code=401)
+
+        payload = verify_token(token)
+        if not payload:
+            return JSONResponse({
+                'error': 'invalid_token',
+                'message': 'Token is invalid or expired'
+            }, status_code=401)
+
+        if is_account_locked(payload['user_id']):
+            return JSONResponse({
+                'error': 'account_locked',
+                'message': 'Account temporarily locked due to multiple failed attempts'
+            }, status_code=403)
+
+        # Limite por usuário, compartilhado entre os IPs do usuário
+        limited = rate_limited(f"{f.__name__}:user:{payload['user_id']}", user_rate)
+        if limited is not None:
+            return limited
+
+        current_user = {
+            'username': payload['user_id'],
+            'is_admin': payload.get('role') == 'admin',
+            'permissions': payload.get('permissions', []),
+            'token_exp': payload['exp']
+        }
+        return await f(request, current_user)
+
+    return decorated
+
+
+class AlertBroadcaster:
+    """Um único poller do MongoDB compartilhado por todos os clientes SSE"""
+
+    def __init__(self, database, interval=ALERT_POLL_INTERVAL):
+        self.db = database
+        self.interval = interval
+        self.subscribers = set()
+        self.last_id = None
+        self._task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        indexed = False
+        while True:
+            await asyncio.sleep(self.interval)
+            # Sem clientes conectados não há consulta ao banco; ao reconectar
+            # o cursor recomeça da detecção mais recente
+            if not self.subscribers:
+                self.last_id = None
+                continue
+            try:
+                if not indexed:
+                    await self.db.ensure_alert_index()
+                    indexed = True
+                await self._poll()
+            except Exception as e:
+                logger.error(f"Erro ao consultar alertas: {str(e)}")
+
+    async def _poll(self):
+        head = await self.db.get_latest_detection_id()
+        if self.last_id is None or head is None:
+            self.last_id = head
+            return
+        if head == self.last_id:
+            return
+
+        detections = await self.db.get_isp_detections_after(self.last_id, head, ALERT_BATCH)
+        for detection in detections:
+            self._publish(self._build_alert(detection))
+        # Sem alertas pendentes o cursor vai até a cabeça: não relê documentos sem ISP
+        self.last_id = detections[-1]['_id'] if len(detections) == ALERT_BATCH else head
+
+    @staticmethod
+    def _build_alert(detection):
+        isp = [v for v in detection['vehicles'] if v.get('is_isp')]
+        return {
+            'type': 'TARGET_DETECTED',
+            'camera_id': detection['camera_id'],
+            'timestamp': detection['timestamp'].isoformat(),
+            'message': 'Veículo ISP detectado',
+            'confidence': isp[0]['confidence'] if isp else None
+        }
+
+    def _publish(self, alert):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(alert)
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o alerta em vez de acumular memória
+                pass
+
+
+broadcaster = AlertBroadcaster(db)
+
+
+async def health_check(request):
+    return JSONResponse({'status': 'healthy'})
+
+
+@token_required
+async def add_camera(request, current_user):
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse({'error': 'JSON inválido'}, status_code=400)
+    if not isinstance(data, dict) or not all([data.get('camera_id'), data.get('rtsp_url')]):
+        return JSONResponse({'error': 'Dados incompletos'}, status_code=400)
+
+    try:
+        priority = int(data.get('priority', DEFAULT_PRIORITY))
+    except (TypeError, ValueError):
+        return JSONResponse({'error': 'Prioridade inválida'}, status_code=400)
+
+    await db.add_camera(data['camera_id'], data.get('location', ''), data['rtsp_url'],
+                        priority=priority)
+    start_camera(data['camera_id'], data['rtsp_url'])
+    return JSONResponse({'message': 'Câmera adicionada'}, status_code=201)
+
+
+@token_required
+async def get_detections(request, current_user):
+    detections = await db.get_recent_detections(
+        camera_id=request.query_params.get('camera_id'),
+        limit=min(int(request.query_params.get('limit', 100)), 1000)
+    )
+    return json_response(detections)
+
+
+async def alert_stream(request):
+    queue = broadcaster.subscribe()
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    alert = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                    yield f"data: {json.dumps(alert)}\n\n"
+                except asyncio.TimeoutError:
+                    # Comentário SSE mantém a conexão viva através de proxies
+                    yield ": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type='text/event-stream')
+
+
+@asynccontextmanager
+async def lifespan(app):
+    start_workers()
+    broadcaster.start()
+    yield
+    await broadcaster.stop()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/api/cameras', add_camera, methods=['POST']),
+        Route('/api/detections', get_detections, methods=['GET']),
+        Route('/api/alerts', alert_stream, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware,
+                   allow_origins=["http://localhost:8000", "http://127.0.0.1:8000"],
+                   allow_methods=["GET", "POST", "PUT", "DELETE"],
+                   allow_headers=["Content-Type", "Authorization"])
+    ],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=8000)
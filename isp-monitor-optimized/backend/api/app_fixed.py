@@ -1,17 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-import cv2
-import logging
-from datetime import datetime
-from threading import Thread
-from queue import Queue
+import atexit
+import json
 import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
 from dotenv import load_dotenv
 
 # Importações locais
-from database import DetectionDatabase
-from auth import token_required
-from ai_models.pipeline import DetectionPipeline
+import auth
+from auth import token_required, admin_required
+from memory_diagnostics import MemoryDiagnostics
+from rate_limit import limiter, remote_address
+from ai_models.quality_controller import DEFAULT_PRIORITY
+from dashboard import DashboardService
+from cluster import CameraLeaseManager
+from workers import (db, pipeline, quality, heatmaps, clips, active_cameras,
+                     processing_results, NODE_ID, start_camera, stop_camera,
+                     is_camera_running, start_workers)
 
 # Configurações iniciais
 load_dotenv()
@@ -26,40 +37,45 @@ CORS(app, resources={
     }
 })
 
-db = DetectionDatabase()
-pipeline = DetectionPipeline()
+# Modo cluster: câmeras distribuídas entre nós via leases no MongoDB
+CLUSTER_MODE = os.getenv('CLUSTER_MODE', 'False') == 'True'
+MAX_CAMERAS = int(os.getenv('MAX_CAMERAS', '5'))
+lease_manager = None
 
-# Sistema de processamento
-camera_queue = Queue()
-active_cameras = {}
-processing_results = {}
+if CLUSTER_MODE:
+    start_workers(MAX_CAMERAS)
+    lease_manager = CameraLeaseManager(
+        db, node_id=NODE_ID, max_cameras=MAX_CAMERAS,
+        on_acquire=lambda camera: start_camera(camera['camera_id'], camera['rtsp_url']),
+        on_release=stop_camera,
+        is_running=is_camera_running
+    )
+    lease_manager.start()
+    # Libera leases e remove o nó ao encerrar, para rebalanceamento imediato
+    atexit.register(lease_manager.stop)
+    if (threading.current_thread() is threading.main_thread()
+            and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL):
+        # SIGTERM padrão encerra sem rodar atexit; servidores como gunicorn já tratam o sinal
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+else:
+    start_workers(MAX_CAMERAS)
 
-def camera_worker():
-    while True:
-        camera_id, rtsp_url = camera_queue.get()
-        try:
-            cap = cv2.VideoCapture(rtsp_url)
-            active_cameras[camera_id] = True
-            
-            while active_cameras.get(camera_id, False):
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                _, detections = pipeline.process_frame(frame)
-                db.log_detection(camera_id, frame, detections)
-                processing_results[camera_id] = {
-                    'last_update': datetime.now(),
-                    'detections': detections
-                }
-                
-        except Exception as e:
-            logging.error(f"Erro câmera {camera_id}: {str(e)}")
-        finally:
-            if 'cap' in locals():
-                cap.release()
-
-Thread(target=camera_worker, daemon=True).start()
+# Também cria o índice parcial de detecções ISP usado pelos alertas SSE
+dashboard = DashboardService(db)
+
+# Arquivo colunar do histórico (requer pyarrow, dependência opcional).
+# Carregado sob demanda; habilite a compactação em apenas um nó
+archive = None
+
+def get_archive():
+    global archive
+    if archive is None:
+        from archive import DetectionArchive
+        archive = DetectionArchive(db)
+    return archive
+
+if os.getenv('ARCHIVE_ENABLED', 'False') == 'True':
+    get_archive().start_periodic()
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -72,10 +88,31 @@ def add_camera(current_user):
     if not all([data.get('camera_id'), data.get('rtsp_url')]):
         return jsonify({'error': 'Dados incompletos'}), 400
     
-    db.add_camera(data['camera_id'], data.get('location', ''), data['rtsp_url'])
-    camera_queue.put((data['camera_id'], data['rtsp_url']))
+    try:
+        priority = int(data.get('priority', DEFAULT_PRIORITY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Prioridade inválida'}), 400
+    
+    db.add_camera(data['camera_id'], data.get('location', ''), data['rtsp_url'],
+                  priority=priority)
+    # No modo cluster o nó com cota livre assume a câmera no próximo heartbeat
+    if not CLUSTER_MODE:
+        start_camera(data['camera_id'], data['rtsp_url'])
     return jsonify({'message': 'Câmera adicionada'}), 201
 
+@app.route('/api/cameras', methods=['GET'])
+@token_required
+def list_cameras(current_user):
+    # Lido do banco: qualquer nó responde, independente de quem processa
+    return jsonify(db.list_cameras()), 200
+
+@app.route('/api/cluster', methods=['GET'])
+@token_required
+def cluster_status(current_user):
+    if lease_manager is None:
+        return jsonify({'node_id': NODE_ID, 'cluster_mode': False}), 200
+    return jsonify(dict(lease_manager.get_status(), cluster_mode=True)), 200
+
 @app.route('/api/detections', methods=['GET'])
 @token_required
 def get_detections(current_user):
@@ -85,59 +122,250 @@ def get_detections(current_user):
     )
     return jsonify(detections), 200
 
+@app.route('/api/dashboard', methods=['GET'])
+@token_required
+def get_dashboard(current_user):
+    # Cursor pela query string ou pelo ETag enviado em If-None-Match
+    cursor = request.args.get('cursor') or request.headers.get('If-None-Match', '').strip('"')
+    try:
+        payload, new_cursor = dashboard.build(cursor or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if payload is None:
+        response = Response(status=304)
+    else:
+        body, encoding = dashboard.encode_body(payload, request.headers.get('Accept-Encoding', ''))
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = f'"{new_cursor}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding, Authorization'
+    return response
+
+@app.route('/api/detections/<detection_id>/clip', methods=['GET'])
+@token_required
+def get_detection_clip(current_user, detection_id):
+    try:
+        oid = ObjectId(detection_id)
+    except InvalidId:
+        return jsonify({'error': 'ID inválido'}), 400
+    
+    detection = db.detections.find_one({'_id': oid}, {'clip': 1})
+    if detection is not None:
+        clip_path = (detection.get('clip') or {}).get('path')
+    else:
+        # Detecções antigas já foram compactadas para o arquivo Parquet
+        try:
+            archived = get_archive().get_detection(
+                detection_id, oid.generation_time.replace(tzinfo=None), columns=['clip_path'])
+        except ImportError:
+            archived = None
+        clip_path = archived and archived['clip_path']
+    
+    if not clip_path:
+        return jsonify({'error': 'Clipe não encontrado'}), 404
+    return send_from_directory(os.path.abspath(clips.output_dir), clip_path,
+                               mimetype='video/mp4')
+
+@app.route('/api/clips/status', methods=['GET'])
+@token_required
+def clips_status(current_user):
+    return jsonify(clips.get_status()), 200
+
+@app.route('/api/cameras/<camera_id>/priority', methods=['PUT'])
+@token_required
+def set_camera_priority(current_user, camera_id):
+    data = request.get_json() or {}
+    if 'priority' not in data:
+        return jsonify({'error': 'Dados incompletos'}), 400
+    
+    try:
+        priority = int(data['priority'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Prioridade inválida'}), 400
+    
+    db.set_camera_priority(camera_id, priority)
+    if camera_id in active_cameras:
+        quality.register_camera(camera_id, priority)
+    return jsonify({'message': 'Prioridade atualizada'}), 200
+
+@app.route('/api/quality', methods=['GET'])
+@token_required
+def get_quality_status(current_user):
+    return jsonify(quality.get_status()), 200
+
+@app.route('/api/cascade', methods=['GET'])
+@token_required
+def get_cascade_stats(current_user):
+    return jsonify(pipeline.get_cascade_stats()), 200
+
+@app.route('/api/cameras/<camera_id>/heatmap.png', methods=['GET'])
+@token_required
+def camera_heatmap(current_user, camera_id):
+    kind = request.args.get('kind', 'dwell')
+    if kind not in ('dwell', 'hits'):
+        return jsonify({'error': 'kind deve ser dwell ou hits'}), 400
+    
+    try:
+        hours = float(request.args.get('hours', 24))
+    except ValueError:
+        hours = None
+    if hours is None or not 0 < hours < float('inf'):
+        return jsonify({'error': 'hours deve ser um número positivo'}), 400
+    
+    end = time.time()
+    start = end - hours * 3600
+    grid = heatmaps.query(camera_id, start, end, kind=kind)
+    response = Response(heatmaps.render_png(grid), mimetype='image/png')
+    response.headers['X-Heatmap-Total'] = f"{float(grid.sum()):.1f}"
+    return response
+
+def _history_unavailable():
+    return jsonify({'error': 'Histórico indisponível: instale pyarrow'}), 501
+
+def _parse_range():
+    start = request.args.get('start')
+    end = request.args.get('end')
+    return (datetime.fromisoformat(start) if start else None,
+            datetime.fromisoformat(end) if end else None)
+
+@app.route('/api/history/counts', methods=['GET'])
+@token_required
+def history_counts(current_user):
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify({'error': 'Datas inválidas (use ISO 8601)'}), 400
+    try:
+        history = get_archive()
+    except ImportError:
+        return _history_unavailable()
+    return jsonify(history.daily_counts(request.args.get('camera_id'), start, end)), 200
+
+@app.route('/api/history/isp', methods=['GET'])
+@token_required
+def history_isp(current_user):
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify({'error': 'Datas inválidas (use ISO 8601)'}), 400
+    try:
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+    except ValueError:
+        return jsonify({'error': 'Limite inválido'}), 400
+    if limit < 1:
+        return jsonify({'error': 'Limite inválido'}), 400
+    try:
+        history = get_archive()
+    except ImportError:
+        return _history_unavailable()
+    sightings = history.isp_sightings(request.args.get('camera_id'), start, end,
+                                      limit=limit)
+    return jsonify(sightings), 200
+
 @app.errorhandler(500)
 def handle_500(e):
     return jsonify({'error': 'Internal server error'}), 500
 
-from flask import Response
-import json
-import time
+ALERT_POLL_INTERVAL = float(os.getenv('ALERT_POLL_INTERVAL', '0.5'))
+ALERT_BATCH = 50
+SSE_KEEPALIVE = 15  # segundos
+# Cada conexão SSE prende uma thread do servidor: limita aberturas e conexões simultâneas por IP
+ALERT_RATE_LIMIT = os.getenv('ALERT_RATE_LIMIT', '10 per minute')
+SSE_MAX_CONNECTIONS_PER_IP = int(os.getenv('SSE_MAX_CONNECTIONS_PER_IP', '3'))
+_sse_connections = {}  # ip -> conexões abertas
+_sse_lock = threading.Lock()
 
-from collections import deque
+def _build_alert(detection):
+    isp = [v for v in detection['vehicles'] if v.get('is_isp')]
+    return {
+        'type': 'TARGET_DETECTED',
+        'camera_id': detection['camera_id'],
+        'timestamp': detection['timestamp'].isoformat(),
+        'message': 'Veículo ISP detectado',
+        'confidence': isp[0]['confidence'] if isp else None
+    }
 
-# Cache de últimas detecções para evitar alertas duplicados
-last_detections = deque(maxlen=10)
+def _release_sse(ip):
+    with _sse_lock:
+        remaining = _sse_connections.pop(ip, 1) - 1
+        if remaining > 0:
+            _sse_connections[ip] = remaining
 
 @app.route('/api/alerts')
+@limiter.limit(ALERT_RATE_LIMIT)
 def alert_stream():
+    ip = remote_address()
+    with _sse_lock:
+        if _sse_connections.get(ip, 0) >= SSE_MAX_CONNECTIONS_PER_IP:
+            return jsonify({
+                'error': 'too_many_connections',
+                'message': f'At most {SSE_MAX_CONNECTIONS_PER_IP} alert streams per client'
+            }), 429
+        _sse_connections[ip] = _sse_connections.get(ip, 0) + 1
+
     def event_stream():
-        try:
-            while True:
-                # Verifica novas detecções no banco de dados
-                latest = db.get_recent_detections(limit=1)
-                if latest and latest[0]['_id'] not in last_detections:
-                    detection = latest[0]
-                    last_detections.append(detection['_id'])
-                    
-                    if any(v.get('is_isp', False) for v in detection['vehicles']):
-                        alert = {
-                            'type': 'TARGET_DETECTED',
-                            'camera_id': detection['camera_id'],
-                            'timestamp': detection['timestamp'].isoformat(),
-                            'message': f"Veículo ISP detectado - {detection['vehicles'][0]['model']}",
-                            'confidence': detection['vehicles'][0]['confidence']
-                        }
-                        yield f"data: {json.dumps(alert)}\n\n"
-                
-                time.sleep(0.5)  # Verifica mais frequentemente
-                if latest_detections:
-                    detection = latest_detections[0]
-                    if any(v['is_isp'] for v in detection['vehicles']):
-                        alert = {
-                            'type': 'TARGET_DETECTED',
-                            'camera_id': detection['camera_id'],
-                            'timestamp': detection['timestamp'].isoformat(),
-                            'message': 'Veículo ISP detectado'
-                        }
-                        yield f"data: {json.dumps(alert)}\n\n"
-                
-                time.sleep(1)  # Verifica a cada segundo
-                
-        except GeneratorExit:
-            # Remove cliente quando a conexão é fechada
-            sse_clients.pop()
+        # Cada conexão acompanha seu próprio cursor a partir da detecção mais recente
+        last_id = db.get_latest_detection_id()
+        last_sent = time.time()
+        while True:
+            time.sleep(ALERT_POLL_INTERVAL)
+            head = db.get_latest_detection_id()
+            if head is not None and head != last_id:
+                detections = db.get_isp_detections_after(last_id, head, ALERT_BATCH) if last_id else []
+                for detection in detections:
+                    yield f"data: {json.dumps(_build_alert(detection))}\n\n"
+                    last_sent = time.time()
+                # Sem alertas pendentes o cursor vai até a cabeça: não relê documentos sem ISP
+                last_id = detections[-1]['_id'] if len(detections) == ALERT_BATCH else head
+            
+            if time.time() - last_sent > SSE_KEEPALIVE:
+                # Comentário SSE mantém a conexão viva através de proxies
+                yield ": keepalive\n\n"
+                last_sent = time.time()
             
-    return Response(event_stream(), mimetype="text/event-stream")
+    response = Response(event_stream(), mimetype="text/event-stream")
+    # Chamado quando o cliente desconecta, mesmo se o gerador nunca iniciou
+    response.call_on_close(lambda: _release_sse(ip))
+    return response
+
+# Diagnóstico de memória (opt-in): MEMORY_DIAGNOSTICS=True
+memory = None
+if os.getenv('MEMORY_DIAGNOSTICS', 'False') == 'True':
+    memory = MemoryDiagnostics(
+        # Rastreamento contínuo é caro; o padrão são janelas via ?trace=<segundos>
+        use_tracemalloc=os.getenv('MEMORY_TRACEMALLOC', 'False') == 'True'
+    )
+    memory.register_gauge('processing_results', processing_results)
+    memory.register_gauge('active_cameras', active_cameras)
+    memory.register_gauge('token_blacklist', auth.token_blacklist)
+    memory.register_gauge('users_db', auth.users_db)
+    memory.register_gauge('quality_cameras', quality.cameras)
+    memory.register_gauge('quality_decisions', quality.decisions)
+    memory.register_gauge('heatmap_cameras', heatmaps.buckets)
+    memory.register_gauge('rate_limit_keys', limiter.size)
+    memory.register_gauge('clip_recorder', clips.get_status)
+    pipeline.memory_probe = memory.track_arrays
+    memory.start()
+
+@app.route('/api/admin/memory', methods=['GET'])
+@admin_required
+def memory_report(current_user):
+    if memory is None:
+        return jsonify({'error': 'Diagnóstico desabilitado (MEMORY_DIAGNOSTICS=True)'}), 404
+    if request.args.get('trace'):
+        try:
+            seconds = int(request.args['trace'])
+        except ValueError:
+            return jsonify({'error': 'trace deve ser um número de segundos'}), 400
+        if not memory.start_trace_window(seconds):
+            return jsonify({'error': 'tracemalloc já está ativo'}), 409
+        return jsonify(memory.report()), 202
+    if request.args.get('snapshot') == '1':
+        memory.take_snapshot()
+    return jsonify(memory.report()), 200
 
 @app.errorhandler(502)
 def handle_502(e):
@@ -145,6 +373,6 @@ def handle_502(e):
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', 
-            port=8000,
+            port=int(os.getenv('PORT', '8000')),
             threaded=True,
             use_reloader=False)
\ No newline at end of file
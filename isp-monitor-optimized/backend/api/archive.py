@@ -0,0 +1,224 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive/detections')
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '7'))
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', '3600'))  # segundos
+
+# Colunas gravadas nos arquivos; camera_id e date vêm do caminho (hive)
+ARCHIVE_SCHEMA = pa.schema([
+    ('detection_id', pa.string()),
+    ('timestamp', pa.timestamp('ms')),
+    ('total_vehicles', pa.int32()),
+    ('isp_vehicle_count', pa.int32()),
+    ('frame_width', pa.int32()),
+    ('frame_height', pa.int32()),
+    ('vehicle_bbox', pa.list_(pa.list_(pa.int32(), 4))),
+    ('vehicle_confidence', pa.list_(pa.float32())),
+    ('vehicle_class_id', pa.list_(pa.int16())),
+    ('vehicle_is_isp', pa.list_(pa.bool_())),
+    ('clip_path', pa.string()),
+    ('clip_start', pa.timestamp('ms')),
+    ('clip_end', pa.timestamp('ms')),
+    ('clip_frames', pa.int32())
+])
+
+PARTITION_SCHEMA = pa.schema([('camera_id', pa.string()), ('date', pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+# Esquema explícito: colunas ausentes em arquivos antigos são lidas como nulas
+DATASET_SCHEMA = pa.unify_schemas([ARCHIVE_SCHEMA, PARTITION_SCHEMA])
+
+
+class DetectionArchive:
+    """Compacta detecções antigas em Parquet particionado por câmera/dia.
+
+    Layout: <root>/camera_id=<id>/date=<YYYY-MM-DD>/part-<first>-<last>.parquet.
+    Os documentos só são removidos do MongoDB depois que o arquivo foi
+    gravado (rename atômico). Rode a compactação em um único nó.
+    """
+
+    def __init__(self, db=None, root=ARCHIVE_DIR, retention_days=ARCHIVE_RETENTION_DAYS,
+                 batch_size=10000):
+        self.db = db
+        self.root = os.path.abspath(root)
+        self.retention = timedelta(days=retention_days)
+        self.batch_size = batch_size
+        # Leitura via mmap: o SO pagina só as colunas/row groups lidos
+        self.filesystem = fs.LocalFileSystem(use_mmap=True)
+        self._stop = threading.Event()
+
+    # --- Compactação ---
+
+    def compact(self, now=None):
+        """Move detections older than the retention window to Parquet"""
+        cutoff = (now or datetime.now()) - self.retention
+        self.db.detections.create_index([('timestamp', 1)])
+
+        buffers = {}
+        current_day = None
+        archived = 0
+        cursor = self.db.detections.find({'timestamp': {'$lt': cutoff}}).sort('timestamp', 1)
+        for doc in cursor:
+            day = doc['timestamp'].strftime('%Y-%m-%d')
+            if day != current_day:
+                # Cursor ordenado por timestamp: as partições do dia anterior estão
+                # completas, então a memória fica limitada a câmeras x batch_size
+                for key, rows in buffers.items():
+                    archived += self._flush(key, rows)
+                buffers = {}
+                current_day = day
+
+            key = (doc['camera_id'], day)
+            rows = buffers.setdefault(key, [])
+            rows.append(doc)
+            if len(rows) >= self.batch_size:
+                archived += self._flush(key, buffers.pop(key))
+
+        for key, rows in buffers.items():
+            archived += self._flush(key, rows)
+
+        logger.info(f"Arquivadas {archived} detecções anteriores a {cutoff}")
+        return archived
+
+    def _flush(self, key, docs):
+        camera_id, day = key
+        table = self._to_table(docs)
+        directory = os.path.join(self.root, f"camera_id={quote(str(camera_id), safe='')}",
+                                 f"date={day}")
+        os.makedirs(directory, exist_ok=True)
+
+        # Nome determinístico: reexecução após falha sobrescreve o mesmo arquivo
+        name = f"part-{docs[0]['_id']}-{docs[-1]['_id']}.parquet"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, tmp_path, compression='zstd', row_group_size=64 * 1024)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+        self.db.detections.delete_many({'_id': {'$in': [d['_id'] for d in docs]}})
+        return len(docs)
+
+    @staticmethod
+    def _to_table(docs):
+        columns = {name: [] for name in ARCHIVE_SCHEMA.names}
+        for doc in docs:
+            vehicles = doc.get('vehicles') or []
+            frame = doc.get('frame_metadata') or {}
+            clip = doc.get('clip') or {}
+            columns['detection_id'].append(str(doc['_id']))
+            columns['timestamp'].append(doc['timestamp'])
+            columns['total_vehicles'].append(doc.get('total_vehicles', len(vehicles)))
+            columns['isp_vehicle_count'].append(doc.get('isp_vehicle_count', 0))
+            columns['frame_width'].append(frame.get('width'))
+            columns['frame_height'].append(frame.get('height'))
+            columns['vehicle_bbox'].append([v['bbox'] for v in vehicles])
+            columns['vehicle_confidence'].append([v.get('confidence') for v in vehicles])
+            columns['vehicle_class_id'].append([v.get('class_id') for v in vehicles])
+            columns['vehicle_is_isp'].append([bool(v.get('is_isp')) for v in vehicles])
+            columns['clip_path'].append(clip.get('path'))
+            columns['clip_start'].append(clip.get('start'))
+            columns['clip_end'].append(clip.get('end'))
+            columns['clip_frames'].append(clip.get('frames'))
+        return pa.table(columns, schema=ARCHIVE_SCHEMA)
+
+    def start_periodic(self, interval=ARCHIVE_INTERVAL):
+        """Run compact() every interval seconds in a daemon thread"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Erro na compactação do arquivo: {str(e)}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Consulta ---
+
+    def dataset(self):
+        # Arquivos iniciados por '.' (gravações em andamento) são ignorados
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING,
+                          schema=DATASET_SCHEMA, filesystem=self.filesystem)
+
+    def query(self, columns=None, camera_id=None, start=None, end=None, isp_only=False):
+        """Read archived detections as an Arrow table.
+
+        Only the requested columns are read; camera/day filters prune
+        partitions and timestamp/ISP filters are pushed down to row groups.
+        """
+        if not os.path.isdir(self.root):
+            return ARCHIVE_SCHEMA.empty_table()
+
+        expr = None
+        def add(condition):
+            nonlocal expr
+            expr = condition if expr is None else expr & condition
+
+        if camera_id:
+            add(ds.field('camera_id') == str(camera_id))
+        if start:
+            add(ds.field('date') >= start.strftime('%Y-%m-%d'))
+            add(ds.field('timestamp') >= pa.scalar(start, pa.timestamp('ms')))
+        if end:
+            add(ds.field('date') <= end.strftime('%Y-%m-%d'))
+            add(ds.field('timestamp') < pa.scalar(end, pa.timestamp('ms')))
+        if isp_only:
+            add(ds.field('isp_vehicle_count') > 0)
+
+        return self.dataset().to_table(columns=columns, filter=expr)
+
+    def daily_counts(self, camera_id=None, start=None, end=None):
+        """Per camera/day detection, vehicle and ISP sighting totals"""
+        table = self.query(columns=['camera_id', 'date', 'total_vehicles', 'isp_vehicle_count'],
+                           camera_id=camera_id, start=start, end=end)
+        if table.num_rows == 0:
+            return []
+        grouped = table.group_by(['camera_id', 'date']).aggregate([
+            ('total_vehicles', 'count'),
+            ('total_vehicles', 'sum'),
+            ('isp_vehicle_count', 'sum')
+        ])
+        rows = [{
+            'camera_id': row['camera_id'],
+            'date': row['date'],
+            'detections': row['total_vehicles_count'],
+            'total_vehicles': row['total_vehicles_sum'],
+            'isp_vehicles': row['isp_vehicle_count_sum']
+        } for row in grouped.to_pylist()]
+        return sorted(rows, key=lambda row: (row['camera_id'], row['date']))
+
+    def get_detection(self, detection_id, created_at, columns=None):
+        """One archived detection as a dict, or None.
+
+        created_at (e.g. the ObjectId generation time, UTC) limits the scan
+        to the date partitions within a day of it.
+        """
+        if not os.path.isdir(self.root):
+            return None
+        start = created_at - timedelta(days=1)
+        end = created_at + timedelta(days=1)
+        expr = ((ds.field('date') >= start.strftime('%Y-%m-%d')) &
+                (ds.field('date') <= end.strftime('%Y-%m-%d')) &
+                (ds.field('detection_id') == str(detection_id)))
+        table = self.dataset().to_table(columns=columns, filter=expr)
+        return table.slice(0, 1).to_pylist()[0] if table.num_rows else None
+
+    def isp_sightings(self, camera_id=None, start=None, end=None, limit=1000):
+        """Archived detections containing ISP vehicles, oldest first"""
+        table = self.query(columns=['camera_id', 'timestamp', 'isp_vehicle_count', 'detection_id'],
+                           camera_id=camera_id, start=start, end=end, isp_only=True)
+        table = table.take(pc.sort_indices(table, [('timestamp', 'ascending')])[:limit])
+        return table.to_pylist()
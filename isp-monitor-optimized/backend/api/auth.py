@@ -3,9 +3,15 @@ from flask import request, jsonify
 import jwt
 from datetime import datetime, timedelta
 import os
+import time
+import heapq
+import logging
+import threading
 from dotenv import load_dotenv
+from rate_limit import limiter
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Configuration
 SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
@@ -13,10 +19,16 @@ TOKEN_EXPIRE_HOURS = 24
 
 # Enhanced authentication system
 users_db = {}
-token_blacklist = set()
+token_blacklist = {}  # token -> exp (epoch); expired entries are pruned
+_blacklist_expiry = []  # heap of (exp, token): pruning pops only expired tokens
+_blacklist_lock = threading.Lock()
 MAX_LOGIN_ATTEMPTS = 5
 LOCKOUT_TIME = timedelta(minutes=15)
 
+# Rate limits padrão das rotas protegidas (sobrescritos via RATE_LIMITS)
+IP_RATE_LIMIT = os.getenv('IP_RATE_LIMIT', '100 per minute')
+USER_RATE_LIMIT = os.getenv('USER_RATE_LIMIT', '100 per minute')
+
 def is_account_locked(username):
     """Check if account is temporarily locked due to failed attempts"""
     user = users_db.get(username)
@@ -27,6 +39,8 @@ def is_account_locked(username):
         lock_time = user.get('lock_time')
         if lock_time and datetime.utcnow() < lock_time + LOCKOUT_TIME:
             return True
+        # Bloqueio expirado: limpa o estado em vez de mantê-lo para sempre
+        reset_login_attempts(username)
     return False
 
 def record_failed_attempt(username):
@@ -149,13 +163,25 @@ def verify_token(token):
         logger.error(f"Token verification error: {str(e)}")
         return None
 
+def prune_token_blacklist(now=None):
+    """Drop blacklisted tokens that have expired anyway (O(log n) each)"""
+    now = now or time.time()
+    with _blacklist_lock:
+        while _blacklist_expiry and _blacklist_expiry[0][0] <= now:
+            _, token = heapq.heappop(_blacklist_expiry)
+            token_blacklist.pop(token, None)
+
 def logout(token):
     """Invalidate token by adding it to blacklist"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        expiry = payload['exp'] - datetime.utcnow().timestamp()
-        if expiry > 0:  # Only blacklist if token hasn't expired
-            token_blacklist.add(token)
+        now = time.time()
+        if payload['exp'] > now:  # Only blacklist if token hasn't expired
+            prune_token_blacklist(now)
+            with _blacklist_lock:
+                if token not in token_blacklist:
+                    token_blacklist[token] = payload['exp']
+                    heapq.heappush(_blacklist_expiry, (payload['exp'], token))
             logger.info(f"User {payload['user_id']} logged out")
             return True
     except:
@@ -164,8 +190,10 @@ def logout(token):
 
 def token_required(f):
     """Decorator to require valid JWT token with enhanced security"""
+    user_rate = limiter.rate_for(f'{f.__name__}:user', USER_RATE_LIMIT)
+
     @wraps(f)
-    @limiter.limit("100 per minute")  # Rate limit protected endpoints
+    @limiter.limit(IP_RATE_LIMIT, scope=f.__name__)  # Per-IP limit, checked before auth
     def decorated(*args, **kwargs):
         token = None
         
@@ -196,6 +224,11 @@ def token_required(f):
                 'message': 'Account temporarily locked due to multiple failed attempts'
             }), 403
         
+        # Per-user limit, shared across the user's IPs
+        limited = limiter.check(f"{f.__name__}:user:{payload['user_id']}", user_rate)
+        if limited is not None:
+            return limited
+        
         # Add user info to kwargs
         kwargs['current_user'] = {
             'username': payload['user_id'],
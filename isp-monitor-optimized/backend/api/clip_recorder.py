@@ -0,0 +1,251 @@
+import cv2
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from queue import Queue, Full
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CLIP_DIR = os.getenv('CLIP_DIR', 'clips')
+CLIP_RETENTION_DAYS = float(os.getenv('CLIP_RETENTION_DAYS', '30'))
+
+
+class FrameRingBuffer:
+    """Quadros JPEG recentes de uma câmera, limitado por bytes e por tempo"""
+
+    def __init__(self, max_bytes, max_seconds):
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.frames = deque()  # (timestamp, jpeg bytes)
+        self.nbytes = 0
+
+    def append(self, timestamp, data):
+        self.frames.append((timestamp, data))
+        self.nbytes += len(data)
+        while self.frames and (self.nbytes > self.max_bytes or
+                               timestamp - self.frames[0][0] > self.max_seconds):
+            _, old = self.frames.popleft()
+            self.nbytes -= len(old)
+
+    def since(self, timestamp):
+        return [frame for frame in self.frames if frame[0] >= timestamp]
+
+
+class ClipRecorder:
+    """Grava clipes curtos antes/depois de uma detecção ISP.
+
+    Quadros brutos 1080p BGR ocupam ~6 MB cada (15 fps x 10 s ~ 900 MB por
+    câmera), por isso o buffer guarda apenas JPEGs reduzidos e amostrados em
+    `fps` (~50-100 KB a 1280px, q70: poucos MB por câmera). O limite de
+    memória é duro: por câmera e global, incluindo os quadros pós-evento
+    pendentes e os clipes na fila de gravação. A gravação do vídeo acontece
+    numa thread separada; se ela estiver atrasada o clipe é descartado em vez
+    de bloquear a câmera. Arquivos mais antigos que retention_days são
+    removidos por sweep().
+    """
+
+    def __init__(self, db=None, output_dir=CLIP_DIR, pre_seconds=5, post_seconds=5, fps=10,
+                 jpeg_quality=70, max_width=1280, max_bytes_per_camera=32 * 1024 * 1024,
+                 max_total_bytes=256 * 1024 * 1024, max_clip_seconds=30, writer_queue=8,
+                 retention_days=CLIP_RETENTION_DAYS):
+        self.db = db
+        self.output_dir = output_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.max_width = max_width
+        self.max_bytes_per_camera = max_bytes_per_camera
+        self.max_total_bytes = max_total_bytes
+        self.max_clip_seconds = max_clip_seconds
+        self.retention_seconds = retention_days * 86400
+        self.buffers = {}
+        self.pending = {}  # camera_id -> clipe aguardando quadros pós-evento
+        self.last_sample = {}
+        self.stats = {'clips_written': 0, 'clips_dropped': 0, 'frames_encoded': 0,
+                      'clips_expired': 0}
+        self.queued_bytes = 0  # clipes aguardando a thread de gravação
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._queue = Queue(maxsize=writer_queue)
+        threading.Thread(target=self._writer, daemon=True).start()
+
+    def _camera_budget(self):
+        # Cota por câmera (buffer + clipe pendente) para respeitar o teto global,
+        # descontados os clipes já enfileirados para gravação
+        cameras = max(len(self.buffers), 1)
+        available = max(self.max_total_bytes - self.queued_bytes, 0)
+        return min(self.max_bytes_per_camera, available // cameras)
+
+    def _encode(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            scale = self.max_width / width
+            frame = cv2.resize(frame, (self.max_width, int(height * scale)),
+                               interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', frame, self.encode_params)
+        return encoded.tobytes() if ok else None
+
+    def add_frame(self, camera_id, frame, timestamp=None):
+        """Encode and buffer a frame if it is due for the recorder fps"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        if timestamp - self.last_sample.get(camera_id, 0) < 1.0 / self.fps:
+            return
+        self.last_sample[camera_id] = timestamp
+
+        data = self._encode(frame)
+        if data is None:
+            return
+        self.stats['frames_encoded'] += 1
+
+        with self._lock:
+            budget = self._camera_budget()
+            buffer = self.buffers.get(camera_id)
+            if buffer is None:
+                buffer = self.buffers[camera_id] = FrameRingBuffer(budget, self.pre_seconds)
+
+            clip = self.pending.get(camera_id)
+            if clip is not None:
+                if clip['nbytes'] + len(data) > budget:
+                    # Cota esgotada: grava o clipe sem este quadro
+                    self._finish(camera_id)
+                else:
+                    clip['frames'].append((timestamp, data))
+                    clip['nbytes'] += len(data)
+                    if timestamp >= clip['end']:
+                        self._finish(camera_id)
+
+            # O clipe pendente divide a cota da câmera com o buffer
+            pending_bytes = self.pending[camera_id]['nbytes'] if camera_id in self.pending else 0
+            buffer.max_bytes = max(budget - pending_bytes, 0)
+            buffer.append(timestamp, data)
+
+    def trigger(self, camera_id, detection_id, timestamp=None):
+        """Start (or extend) a clip around an ISP detection"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            clip = self.pending.get(camera_id)
+            if clip is not None:
+                # Detecções seguidas compartilham o mesmo clipe
+                clip['detection_ids'].append(detection_id)
+                clip['end'] = min(timestamp + self.post_seconds,
+                                  clip['start'] + self.max_clip_seconds)
+                return
+
+            buffer = self.buffers.get(camera_id)
+            frames = buffer.since(timestamp - self.pre_seconds) if buffer else []
+            self.pending[camera_id] = {
+                'camera_id': camera_id,
+                'detection_ids': [detection_id],
+                'start': frames[0][0] if frames else timestamp,
+                'end': timestamp + self.post_seconds,
+                'frames': frames,
+                'nbytes': sum(len(data) for _, data in frames)
+            }
+
+    def _finish(self, camera_id):
+        clip = self.pending.pop(camera_id)
+        try:
+            self._queue.put_nowait(clip)
+            self.queued_bytes += clip['nbytes']
+        except Full:
+            self.stats['clips_dropped'] += 1
+            logger.warning(f"Gravador atrasado, clipe descartado: câmera {camera_id}")
+
+    def remove_camera(self, camera_id):
+        """Free a camera's buffer, flushing any pending clip"""
+        with self._lock:
+            if camera_id in self.pending:
+                self._finish(camera_id)
+            self.buffers.pop(camera_id, None)
+            self.last_sample.pop(camera_id, None)
+
+    def _writer(self):
+        while True:
+            clip = self._queue.get()
+            try:
+                self._write_clip(clip)
+                self.stats['clips_written'] += 1
+            except Exception as e:
+                self.stats['clips_dropped'] += 1
+                logger.error(f"Erro ao gravar clipe da câmera {clip['camera_id']}: {str(e)}")
+            finally:
+                with self._lock:
+                    self.queued_bytes -= clip['nbytes']
+
+    def _write_clip(self, clip):
+        if not clip['frames']:
+            return
+        first = cv2.imdecode(np.frombuffer(clip['frames'][0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+
+        camera_dir = os.path.join(self.output_dir, str(clip['camera_id']))
+        os.makedirs(camera_dir, exist_ok=True)
+        name = f"{clip['detection_ids'][0]}.mp4"
+        path = os.path.join(camera_dir, name)
+
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (width, height))
+        try:
+            writer.write(first)
+            for _, data in clip['frames'][1:]:
+                writer.write(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+        finally:
+            writer.release()
+
+        if self.db is not None:
+            self.db.detections.update_many(
+                {'_id': {'$in': clip['detection_ids']}},
+                {'$set': {'clip': {
+                    'path': os.path.relpath(path, self.output_dir),
+                    'url': f"/api/detections/{clip['detection_ids'][0]}/clip",
+                    'start': datetime.fromtimestamp(clip['start']),
+                    'end': datetime.fromtimestamp(clip['frames'][-1][0]),
+                    'frames': len(clip['frames'])
+                }}}
+            )
+
+    def sweep(self, now=None):
+        """Delete clip files older than the retention window"""
+        cutoff = (now if now is not None else time.time()) - self.retention_seconds
+        expired = []
+        if not os.path.isdir(self.output_dir):
+            return 0
+
+        for camera in os.scandir(self.output_dir):
+            if not camera.is_dir():
+                continue
+            for entry in os.scandir(camera.path):
+                if entry.name.endswith('.mp4') and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    expired.append(os.path.relpath(entry.path, self.output_dir))
+
+        if expired and self.db is not None:
+            self.db.detections.update_many({'clip.path': {'$in': expired}},
+                                           {'$unset': {'clip': ''}})
+        self.stats['clips_expired'] += len(expired)
+        return len(expired)
+
+    def start_periodic(self, interval=3600):
+        """Run sweep() every interval seconds in a daemon thread"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Erro na limpeza de clipes: {str(e)}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get_status(self):
+        with self._lock:
+            return dict(self.stats,
+                        buffered_bytes=sum(b.nbytes for b in self.buffers.values()),
+                        pending_bytes=sum(c['nbytes'] for c in self.pending.values()),
+                        queued_bytes=self.queued_bytes,
+                        cameras=len(self.buffers))
@@ -0,0 +1,147 @@
+import argparse
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LEASE_TTL = int(os.getenv('CLUSTER_LEASE_TTL', '30'))  # segundos
+HEARTBEAT_INTERVAL = int(os.getenv('CLUSTER_HEARTBEAT_INTERVAL', '10'))
+NODE_TTL = int(os.getenv('CLUSTER_NODE_TTL', '3600'))  # remoção de nós mortos
+
+
+def default_node_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class CameraLeaseManager:
+    """Distribui câmeras entre nós via leases na coleção `cameras`.
+
+    A cada heartbeat o nó renova seus leases, calcula sua cota justa
+    (câmeras / nós vivos, limitada por max_cameras), libera o excesso e
+    reivindica câmeras livres ou com lease expirado. Um nó que morre deixa
+    seus leases expirarem e os demais assumem as câmeras. Os relógios dos
+    nós devem estar sincronizados (NTP); o TTL deve ser bem maior que a
+    deriva esperada.
+    """
+
+    def __init__(self, db, node_id=None, max_cameras=5, lease_ttl=LEASE_TTL,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, on_acquire=None,
+                 on_release=None, is_running=None):
+        self.db = db
+        self.node_id = node_id or default_node_id()
+        self.max_cameras = max_cameras
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.on_acquire = on_acquire or (lambda camera: None)
+        self.on_release = on_release or (lambda camera_id: None)
+        self.is_running = is_running
+        self.owned = {}  # camera_id -> documento da câmera
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Nós que morreram sem stop() somem da coleção após NODE_TTL
+        self.db.ensure_node_index(max(NODE_TTL, self.lease_ttl))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Libera todos os leases para rebalanceamento imediato"""
+        self._stop.set()
+        # Espera um heartbeat em andamento, que poderia reivindicar câmeras de novo
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.heartbeat_interval)
+        for camera_id in list(self.owned):
+            self._release(camera_id)
+        self.db.remove_node(self.node_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Erro no heartbeat do nó {self.node_id}: {str(e)}")
+            self._stop.wait(self.heartbeat_interval)
+
+    def fair_share(self, live_nodes, total_cameras):
+        return min(self.max_cameras, math.ceil(total_cameras / max(live_nodes, 1)))
+
+    def heartbeat(self):
+        self.db.register_node(self.node_id, {'cameras': sorted(self.owned)})
+
+        # Renova leases; câmeras tomadas por outro nó são paradas localmente
+        still_owned = self.db.renew_leases(self.node_id, self.owned, self.lease_ttl)
+        for camera_id in set(self.owned) - still_owned:
+            logger.warning(f"Lease perdido: {camera_id}")
+            self.owned.pop(camera_id)
+            self.on_release(camera_id)
+
+        # Reinicia câmeras cujo worker terminou (stream caiu)
+        if self.is_running:
+            for camera_id, camera in self.owned.items():
+                if not self.is_running(camera_id):
+                    self.on_acquire(camera)
+
+        live_nodes = len(self.db.get_live_nodes(self.lease_ttl))
+        share = self.fair_share(live_nodes, self.db.count_cameras())
+
+        # Excesso: libera as de menor prioridade primeiro
+        excess = len(self.owned) - share
+        if excess > 0:
+            by_priority = sorted(self.owned.values(), key=lambda c: c.get('priority', 1))
+            for camera in by_priority[:excess]:
+                self._release(camera['camera_id'])
+
+        while len(self.owned) < share:
+            camera = self.db.claim_camera(self.node_id, self.lease_ttl)
+            if camera is None:
+                break
+            logger.info(f"Nó {self.node_id} assumiu câmera {camera['camera_id']}")
+            self.owned[camera['camera_id']] = camera
+            self.on_acquire(camera)
+
+    def _release(self, camera_id):
+        self.owned.pop(camera_id, None)
+        self.db.release_camera(self.node_id, camera_id)
+        self.on_release(camera_id)
+
+    def get_status(self):
+        return {
+            'node_id': self.node_id,
+            'cameras': sorted(self.owned),
+            'nodes': self.db.get_live_nodes(self.lease_ttl)
+        }
+
+
+if __name__ == '__main__':
+    # Nó apenas de coordenação (sem inferência), para testes locais:
+    #   MONGO_URI=mongodb://localhost:27018/ python cluster.py --node-id a
+    from database import DetectionDatabase
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--node-id')
+    parser.add_argument('--max-cameras', type=int, default=int(os.getenv('MAX_CAMERAS', '5')))
+    parser.add_argument('--ttl', type=int, default=LEASE_TTL)
+    parser.add_argument('--interval', type=int, default=HEARTBEAT_INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    manager = CameraLeaseManager(
+        DetectionDatabase(), node_id=args.node_id, max_cameras=args.max_cameras,
+        lease_ttl=args.ttl, heartbeat_interval=args.interval,
+        on_acquire=lambda camera: print(f"ACQUIRE {camera['camera_id']}", flush=True),
+        on_release=lambda camera_id: print(f"RELEASE {camera_id}", flush=True)
+    )
+    manager.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        manager.stop()
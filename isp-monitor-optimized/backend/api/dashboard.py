@@ -0,0 +1,132 @@
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+HEAD_CACHE_TTL = 1.0  # segundos; compartilhado por todos os dashboards
+MAX_DELTA_DETECTIONS = 50
+SNAPSHOT_DETECTIONS = 5
+GZIP_MIN_BYTES = 1024
+EPOCH = datetime(1970, 1, 1)
+
+
+def _to_json(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+class DashboardService:
+    """Resumo incremental do dashboard a partir de um cursor do cliente.
+
+    O cursor é "<último _id de detecção ISP>.<updated_at das câmeras em ms>"
+    e também é o ETag da resposta. Só detecções com veículos ISP entram no
+    delta (os workers gravam um documento por quadro analisado). Quando nada
+    mudou, basta comparar o cursor com a "cabeça" atual (duas consultas por
+    índice, em cache por 1s) e responder 304 sem montar nenhum documento.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.db.cameras.create_index([('updated_at', -1)])
+        self.db.ensure_alert_index()
+        self._head = None
+        self._head_time = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def encode_cursor(detection_id, cameras_updated_at):
+        ms = (cameras_updated_at - EPOCH) // timedelta(milliseconds=1) if cameras_updated_at else 0
+        return f"{detection_id or ''}.{ms}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """'<oid>.<ms>' -> (ObjectId or None, datetime or None); ValueError if invalid"""
+        detection_part, _, ms_part = cursor.partition('.')
+        try:
+            detection_id = ObjectId(detection_part) if detection_part else None
+            ms = int(ms_part or 0)
+        except (InvalidId, ValueError):
+            raise ValueError(f"Cursor inválido: {cursor}")
+        return detection_id, (EPOCH + timedelta(milliseconds=ms)) if ms else None
+
+    def head_cursor(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._head is None or now - self._head_time > HEAD_CACHE_TTL:
+                self._head = self.encode_cursor(*self.db.get_dashboard_head())
+                self._head_time = now
+            return self._head
+
+    def build(self, cursor=None):
+        """Return (payload, new_cursor); payload is None if nothing changed"""
+        head = self.head_cursor()
+        if cursor and cursor == head:
+            return None, head
+
+        if not cursor:
+            payload = self._snapshot()
+            return payload, payload['cursor']
+
+        last_id, cameras_updated_at = self.decode_cursor(cursor)
+        head_id, _ = self.decode_cursor(head)
+        detections = self.db.get_isp_detections_after(last_id, head_id, MAX_DELTA_DETECTIONS)
+        cameras = self.db.get_cameras_updated_after(cameras_updated_at)
+
+        truncated = len(detections) == MAX_DELTA_DETECTIONS
+        # Sem mais detecções pendentes o cursor vai até a cabeça
+        last_id = detections[-1]['_id'] if truncated else head_id
+        for camera in cameras:
+            if camera.get('updated_at') and (cameras_updated_at is None
+                                             or camera['updated_at'] > cameras_updated_at):
+                cameras_updated_at = camera['updated_at']
+
+        new_cursor = self.encode_cursor(last_id, cameras_updated_at)
+        if not detections and not cameras:
+            return None, new_cursor
+
+        payload = {
+            'cursor': new_cursor,
+            'full': False,
+            'cameras': cameras,
+            'detections': detections,
+            'truncated': truncated,
+            'counters_delta': {
+                'detections': len(detections),
+                'isp_alerts': sum(1 for d in detections if d.get('isp_vehicle_count')),
+                'isp_vehicles': sum(d.get('isp_vehicle_count', 0) for d in detections)
+            }
+        }
+        return payload, new_cursor
+
+    def _snapshot(self):
+        detection_id, cameras_updated_at = self.db.get_dashboard_head()
+        cameras = self.db.get_cameras_updated_after(None)
+        detections = self.db.get_recent_isp_detections(limit=SNAPSHOT_DETECTIONS)[::-1]
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return {
+            'cursor': self.encode_cursor(detection_id, cameras_updated_at),
+            'full': True,
+            'cameras': cameras,
+            'detections': detections,
+            'truncated': False,
+            'counters': {
+                'active_cameras': len(cameras),
+                'detections': len(detections),
+                'today_alerts': self.db.count_isp_detections_since(midnight)
+            }
+        }
+
+    @staticmethod
+    def encode_body(payload, accept_encoding=''):
+        """Serialize payload, gzipping when the client accepts it"""
+        body = json.dumps(payload, default=_to_json, separators=(',', ':')).encode()
+        if 'gzip' in accept_encoding and len(body) >= GZIP_MIN_BYTES:
+            return gzip.compress(body, compresslevel=5), 'gzip'
+        return body, None
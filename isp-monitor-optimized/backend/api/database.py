@@ -1,19 +1,32 @@
 from pymongo import MongoClient
-from datetime import datetime
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+import numpy as np
+from ai_models.vehicle_detection_utils import VehicleDetectionUtils
 
 load_dotenv()
 
+# Índice parcial compartilhado por alertas e dashboard (apenas detecções ISP)
+ISP_INDEX_OPTIONS = {
+    'name': 'isp_detections_by_id',
+    'partialFilterExpression': {'isp_vehicle_count': {'$gt': 0}}
+}
+
 class DetectionDatabase:
     def __init__(self):
         self.client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
         self.db = self.client['isp_vehicle_detection']
         self.detections = self.db['detections']
         self.cameras = self.db['cameras']
+        self.nodes = self.db['nodes']
         
     def log_detection(self, camera_id, frame_data, vehicles):
         """Store detection results in database"""
+        # Registros estruturados viram dicts apenas na fronteira com o banco
+        if isinstance(vehicles, np.ndarray):
+            vehicles = VehicleDetectionUtils.to_dicts(vehicles)
         detection_doc = {
             'camera_id': camera_id,
             'timestamp': datetime.now(),
@@ -34,14 +47,16 @@ class DetectionDatabase:
                    .sort('timestamp', -1)
                    .limit(limit))
     
-    def add_camera(self, camera_id, location, rtsp_url):
+    def add_camera(self, camera_id, location, rtsp_url, priority=1):
         """Register a new camera in the system"""
         return self.cameras.update_one(
             {'camera_id': camera_id},
             {'$set': {
                 'location': location,
                 'rtsp_url': rtsp_url,
-                'last_active': datetime.now()
+                'priority': priority,
+                'last_active': datetime.now(),
+                'updated_at': datetime.utcnow()
             }},
             upsert=True
         )
@@ -50,13 +65,21 @@ class DetectionDatabase:
         """Get camera details"""
         return self.cameras.find_one({'camera_id': camera_id})
     
+    def set_camera_priority(self, camera_id, priority):
+        """Update camera priority used by the quality controller"""
+        return self.cameras.update_one(
+            {'camera_id': camera_id},
+            {'$set': {'priority': priority, 'updated_at': datetime.utcnow()}}
+        )
+
     def update_camera_status(self, camera_id, is_active):
         """Update camera connection status"""
         return self.cameras.update_one(
             {'camera_id': camera_id},
             {'$set': {
                 'is_active': is_active,
-                'last_active': datetime.now()
+                'last_active': datetime.now(),
+                'updated_at': datetime.utcnow()
             }}
         )
 
@@ -78,4 +101,136 @@ class DetectionDatabase:
                 }
             }
         ]
-        return list(self.detections.aggregate(pipeline))
\ No newline at end of file
+        return list(self.detections.aggregate(pipeline))
+
+    # --- Modo cluster: leases de câmeras e heartbeats dos nós ---
+
+    def register_node(self, node_id, info=None):
+        """Upsert node heartbeat document"""
+        return self.nodes.update_one(
+            {'node_id': node_id},
+            {'$set': dict(info or {}, heartbeat=datetime.utcnow())},
+            upsert=True
+        )
+
+    def ensure_node_index(self, ttl_seconds):
+        """TTL index so nodes that died without stop() are eventually removed"""
+        self.nodes.create_index('heartbeat', expireAfterSeconds=ttl_seconds)
+
+    def remove_node(self, node_id):
+        """Remove node document on graceful shutdown"""
+        return self.nodes.delete_one({'node_id': node_id})
+
+    def get_live_nodes(self, ttl_seconds):
+        """Nodes whose heartbeat is newer than ttl_seconds"""
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl_seconds)
+        return list(self.nodes.find({'heartbeat': {'$gte': cutoff}}, {'_id': 0}))
+
+    def count_cameras(self):
+        """Total registered cameras"""
+        return self.cameras.count_documents({'rtsp_url': {'$exists': True}})
+
+    def claim_camera(self, node_id, ttl_seconds):
+        """Atomically take the lease of a free or expired camera"""
+        now = datetime.utcnow()
+        return self.cameras.find_one_and_update(
+            {
+                'rtsp_url': {'$exists': True},
+                '$or': [
+                    {'lease_owner': None},
+                    {'lease_expires': {'$lt': now}}
+                ]
+            },
+            {'$set': {
+                'lease_owner': node_id,
+                'lease_expires': now + timedelta(seconds=ttl_seconds),
+                'updated_at': now
+            }},
+            sort=[('priority', -1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def renew_leases(self, node_id, camera_ids, ttl_seconds):
+        """Extend leases still held by node_id; returns ids actually renewed"""
+        expires = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        self.cameras.update_many(
+            {'camera_id': {'$in': list(camera_ids)}, 'lease_owner': node_id},
+            {'$set': {'lease_expires': expires}}
+        )
+        return {c['camera_id'] for c in self.cameras.find(
+            {'lease_owner': node_id}, {'camera_id': 1})}
+
+    def release_camera(self, node_id, camera_id):
+        """Give up a lease so another node can claim it"""
+        return self.cameras.update_one(
+            {'camera_id': camera_id, 'lease_owner': node_id},
+            {'$set': {'lease_owner': None, 'lease_expires': None,
+                      'updated_at': datetime.utcnow()}}
+        )
+
+    def update_camera_runtime(self, camera_id, node_id, detection_count):
+        """Publish processing status so any node can answer API queries"""
+        return self.cameras.update_one(
+            {'camera_id': camera_id},
+            {'$set': {
+                'processing_node': node_id,
+                'last_update': datetime.now(),
+                'last_detection_count': detection_count
+            }}
+        )
+
+    def list_cameras(self):
+        """All registered cameras with lease and runtime status"""
+        return list(self.cameras.find({}, {'_id': 0}))
+
+    # --- Alertas ---
+
+    def ensure_alert_index(self):
+        """Partial index so ISP-only _id range scans skip frames without ISP vehicles"""
+        self.detections.create_index([('_id', 1), ('isp_vehicle_count', 1)],
+                                     **ISP_INDEX_OPTIONS)
+
+    def get_latest_detection_id(self):
+        """Return the _id of the newest detection, or None"""
+        doc = self.detections.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        return doc['_id'] if doc else None
+
+    def get_isp_detections_after(self, last_id, until_id=None, limit=50):
+        """ISP detections with last_id < _id <= until_id, oldest first"""
+        id_range = {'$gt': last_id} if last_id else {}
+        if until_id is not None:
+            id_range['$lte'] = until_id
+        query = {'isp_vehicle_count': {'$gt': 0}}
+        if id_range:
+            query['_id'] = id_range
+        return list(self.detections.find(query).sort('_id', 1).limit(limit))
+
+    # --- Dashboard incremental ---
+
+    def get_dashboard_head(self):
+        """Newest ISP detection _id and newest camera updated_at (index lookups)"""
+        # Quadros sem veículos ISP não movem a cabeça: o dashboard segue em 304
+        detection = self.detections.find_one({'isp_vehicle_count': {'$gt': 0}}, {'_id': 1},
+                                             sort=[('_id', -1)])
+        camera = self.cameras.find_one({'updated_at': {'$exists': True}},
+                                       {'updated_at': 1}, sort=[('updated_at', -1)])
+        return (detection['_id'] if detection else None,
+                camera['updated_at'] if camera else None)
+
+    def get_recent_isp_detections(self, limit=5):
+        """Newest detections with ISP vehicles, newest first"""
+        return list(self.detections.find({'isp_vehicle_count': {'$gt': 0}})
+                    .sort('_id', -1)
+                    .limit(limit))
+
+    def get_cameras_updated_after(self, updated_at):
+        """Cameras whose status changed after updated_at (all if None)"""
+        query = {'updated_at': {'$gt': updated_at}} if updated_at else {}
+        return list(self.cameras.find(query, {'_id': 0}))
+
+    def count_isp_detections_since(self, since):
+        """Detections with ISP vehicles since a given time"""
+        return self.detections.count_documents({
+            'timestamp': {'$gte': since},
+            'isp_vehicle_count': {'$gt': 0}
+        })
@@ -0,0 +1,55 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+import os
+from dotenv import load_dotenv
+from database import ISP_INDEX_OPTIONS
+
+load_dotenv()
+
+class AsyncDetectionDatabase:
+    def __init__(self):
+        """Async (motor) counterpart of DetectionDatabase used by app_async"""
+        self.client = AsyncIOMotorClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+        self.db = self.client['isp_vehicle_detection']
+        self.detections = self.db['detections']
+        self.cameras = self.db['cameras']
+
+    async def get_recent_detections(self, camera_id=None, limit=100):
+        """Query recent detections, optionally filtered by camera"""
+        query = {'camera_id': camera_id} if camera_id else {}
+        cursor = self.detections.find(query).sort('timestamp', -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def ensure_alert_index(self):
+        """Partial index so ISP-only _id range scans skip frames without ISP vehicles"""
+        await self.detections.create_index([('_id', 1), ('isp_vehicle_count', 1)],
+                                           **ISP_INDEX_OPTIONS)
+
+    async def get_isp_detections_after(self, last_id=None, until_id=None, limit=50):
+        """ISP detections with last_id < _id <= until_id, oldest first"""
+        id_range = {'$gt': last_id} if last_id is not None else {}
+        if until_id is not None:
+            id_range['$lte'] = until_id
+        query = {'isp_vehicle_count': {'$gt': 0}}
+        if id_range:
+            query['_id'] = id_range
+        cursor = self.detections.find(query).sort('_id', 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def get_latest_detection_id(self):
+        """Return the _id of the newest detection, or None"""
+        doc = await self.detections.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        return doc['_id'] if doc else None
+
+    async def add_camera(self, camera_id, location, rtsp_url, priority=1):
+        """Register a new camera in the system"""
+        return await self.cameras.update_one(
+            {'camera_id': camera_id},
+            {'$set': {
+                'location': location,
+                'rtsp_url': rtsp_url,
+                'priority': priority,
+                'last_active': datetime.now()
+            }},
+            upsert=True
+        )
@@ -0,0 +1,229 @@
+import gc
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from itertools import islice
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = int(os.getenv('MEMORY_SNAPSHOT_INTERVAL', '300'))  # segundos
+TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', '1'))
+ARRAY_SAMPLE_EVERY = int(os.getenv('MEMORY_ARRAY_SAMPLE_EVERY', '100'))
+MAX_TRACE_WINDOW = int(os.getenv('MEMORY_TRACE_MAX_SECONDS', '300'))
+GAUGE_SAMPLE_ITEMS = 32
+
+# Ruído do próprio tracemalloc/import nas diferenças de snapshot
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+]
+
+
+def rss_mb():
+    """RSS atual (Linux /proc) ou pico (getrusage) em MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def buffer_nbytes(value):
+    """Bytes de buffers numpy/torch em value (arrays, tensores ou coleções)"""
+    if hasattr(value, 'nbytes') and hasattr(value, 'dtype'):  # numpy
+        return int(value.nbytes)
+    if hasattr(value, 'element_size') and hasattr(value, 'nelement'):  # torch
+        return int(value.element_size() * value.nelement())
+    if isinstance(value, dict):
+        return sum(buffer_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(buffer_nbytes(v) for v in value)
+    return 0
+
+
+def estimate_size(container):
+    """Tamanho raso estimado: contêiner + média de uma amostra dos itens"""
+    size = sys.getsizeof(container)
+    count = len(container)
+    if not count:
+        return size
+    items = container.items() if isinstance(container, dict) else container
+    sample = list(islice(iter(items), GAUGE_SAMPLE_ITEMS))
+    per_item = sum(sys.getsizeof(item) + buffer_nbytes(item) for item in sample) / len(sample)
+    return int(size + per_item * count)
+
+
+class MemoryDiagnostics:
+    """Diagnóstico de memória opt-in para workers de longa duração.
+
+    - Diferenças de snapshots do tracemalloc (guarda apenas o último). O
+      tracemalloc rastreia toda alocação enquanto ativo, por isso o padrão
+      é uma janela curta iniciada sob demanda (start_trace_window);
+      use_tracemalloc=True o mantém ligado com snapshots periódicos.
+    - Gauges de tamanho das estruturas registradas (len + estimativa por
+      amostragem, sem percorrer tudo).
+    - Contabilidade de buffers numpy/torch por etapa do pipeline, amostrada
+      a cada ARRAY_SAMPLE_EVERY chamadas.
+    """
+
+    def __init__(self, interval=SNAPSHOT_INTERVAL, top_n=20, trace_frames=TRACE_FRAMES,
+                 sample_every=ARRAY_SAMPLE_EVERY, use_tracemalloc=False, history=12):
+        self.interval = interval
+        self.top_n = top_n
+        self.trace_frames = trace_frames
+        self.sample_every = max(1, sample_every)
+        self.use_tracemalloc = use_tracemalloc
+        self.gauges = {}
+        self.stages = {}
+        self.top_growth = []
+        self.rss_history = deque(maxlen=history)
+        self._previous = None
+        self._last_snapshot = None
+        self._window_until = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def register_gauge(self, name, target):
+        """Track a container (len/size) or a callable returning a number or dict"""
+        self.gauges[name] = target
+
+    def track_arrays(self, stage, value):
+        """Account numpy/torch buffer bytes for a pipeline stage (sampled)"""
+        info = self.stages.get(stage)
+        if info is None:
+            info = self.stages[stage] = {'calls': 0, 'samples': 0, 'last_bytes': 0,
+                                         'max_bytes': 0, 'total_bytes': 0}
+        info['calls'] += 1
+        if (info['calls'] - 1) % self.sample_every:
+            return
+        nbytes = buffer_nbytes(value)
+        info['samples'] += 1
+        info['last_bytes'] = nbytes
+        info['max_bytes'] = max(info['max_bytes'], nbytes)
+        info['total_bytes'] += nbytes
+
+    def start(self):
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                # Durante uma janela, só o início e o fim dela viram snapshots
+                self.take_snapshot(trace=self.use_tracemalloc)
+            except Exception as e:
+                logger.error(f"Erro no snapshot de memória: {str(e)}")
+
+    def start_trace_window(self, seconds):
+        """Trace allocations for a bounded window; growth is reported when it ends"""
+        seconds = min(max(seconds, 1), MAX_TRACE_WINDOW)
+        with self._lock:
+            if self._window_until is not None or tracemalloc.is_tracing():
+                return False
+            tracemalloc.start(self.trace_frames)
+            self._previous = None
+            self._window_until = time.time() + seconds
+
+        self.take_snapshot()  # linha de base
+        timer = threading.Timer(seconds, self._end_trace_window)
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def _end_trace_window(self):
+        try:
+            self.take_snapshot()
+        except Exception as e:
+            logger.error(f"Erro no snapshot de memória: {str(e)}")
+        finally:
+            tracemalloc.stop()
+            with self._lock:
+                self._previous = None  # libera a memória do snapshot
+                self._window_until = None
+
+    def take_snapshot(self, trace=True):
+        """Record RSS and, if tracing, the top allocation growth since last time"""
+        self.rss_history.append({'timestamp': time.time(), 'rss_mb': rss_mb()})
+        if not trace or not tracemalloc.is_tracing():
+            return
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            if self._previous is not None:
+                stats = snapshot.compare_to(self._previous, 'lineno')[:self.top_n]
+                self.top_growth = [{
+                    'location': str(stat.traceback),
+                    'size_kb': stat.size / 1024,
+                    'size_diff_kb': stat.size_diff / 1024,
+                    'count_diff': stat.count_diff
+                } for stat in stats]
+            self._previous = snapshot
+            self._last_snapshot = time.time()
+
+    def _gauge_values(self):
+        values = {}
+        for name, target in list(self.gauges.items()):
+            try:
+                if callable(target):
+                    values[name] = target()
+                else:
+                    values[name] = {'len': len(target), 'approx_bytes': estimate_size(target)}
+            except Exception as e:
+                values[name] = {'error': str(e)}
+        return values
+
+    def report(self):
+        """Full diagnostics document for the admin endpoint"""
+        traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            top_growth = list(self.top_growth)
+            last_snapshot = self._last_snapshot
+            window_until = self._window_until
+        return {
+            'rss_mb': rss_mb(),
+            'rss_history': list(self.rss_history),
+            'tracemalloc': {
+                'enabled': tracemalloc.is_tracing(),
+                'continuous': self.use_tracemalloc,
+                'window_until': window_until,
+                'current_mb': traced[0] / (1024 * 1024),
+                'peak_mb': traced[1] / (1024 * 1024),
+                'last_snapshot': last_snapshot,
+                'top_growth': top_growth
+            },
+            'gauges': self._gauge_values(),
+            'pipeline_buffers': {stage: dict(info) for stage, info in self.stages.items()},
+            'torch_cuda': self._torch_cuda(),
+            'gc': {'counts': gc.get_count(), 'objects': len(gc.get_objects())
+                   if os.getenv('MEMORY_COUNT_GC_OBJECTS') == 'True' else None}
+        }
+
+    @staticmethod
+    def _torch_cuda():
+        torch = sys.modules.get('torch')
+        if torch is None or not torch.cuda.is_available():
+            return None
+        return {
+            'allocated_mb': torch.cuda.memory_allocated() / (1024 * 1024),
+            'reserved_mb': torch.cuda.memory_reserved() / (1024 * 1024),
+            'max_allocated_mb': torch.cuda.max_memory_allocated() / (1024 * 1024)
+        }
@@ -0,0 +1,132 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RATE_UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'100 per minute' -> (capacity, tokens per second)"""
+    amount, _, unit = rate.strip().split()
+    seconds = RATE_UNITS[unit.rstrip('s')]
+    return int(amount), int(amount) / seconds
+
+
+def remote_address():
+    """Chave por IP do cliente"""
+    return request.remote_addr or 'unknown'
+
+
+class _Shard:
+    __slots__ = ('lock', 'buckets')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()  # key -> [tokens, last_refill, idle_after], ordem LRU
+
+
+class RateLimiter:
+    """Token buckets em memória, O(1) por requisição.
+
+    As chaves são distribuídas em shards, cada um com seu próprio lock, para
+    reduzir contenção entre threads. Cada shard é um OrderedDict em ordem de
+    último acesso: chaves ociosas há mais de idle_ttl são removidas do início
+    a cada inserção (custo amortizado O(1)) e max_keys limita a memória.
+    Uma chave só é considerada ociosa depois de o bucket ter tido tempo de
+    encher de novo, para que a remoção nunca devolva tokens antes da hora
+    (ex: '5 per hour' fica retido por uma hora, não por idle_ttl).
+    """
+
+    def __init__(self, shards=64, max_keys=100000, idle_ttl=600, overrides=None):
+        self.num_shards = 1 << max(0, int(shards - 1).bit_length())
+        self._shards = [_Shard() for _ in range(self.num_shards)]
+        self.max_keys_per_shard = max(1, math.ceil(max_keys / self.num_shards))
+        self.idle_ttl = idle_ttl
+        # Limites por rota, ex: RATE_LIMITS='{"get_detections": "300 per minute"}'
+        self.overrides = overrides if overrides is not None else json.loads(
+            os.getenv('RATE_LIMITS', '{}'))
+        self._parsed = {}
+
+    def _rate(self, rate):
+        parsed = self._parsed.get(rate)
+        if parsed is None:
+            parsed = self._parsed[rate] = parse_rate(rate)
+        return parsed
+
+    def hit(self, key, rate, cost=1):
+        """Consume tokens for key; returns (allowed, retry_after_seconds)"""
+        capacity, refill = self._rate(rate)
+        now = time.monotonic()
+        shard = self._shards[hash(key) & (self.num_shards - 1)]
+
+        with shard.lock:
+            buckets = shard.buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                self._evict(buckets, now)
+                bucket = buckets[key] = [capacity, now, max(self.idle_ttl, capacity / refill)]
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True, 0
+            return False, (cost - bucket[0]) / refill
+
+    def _evict(self, buckets, now):
+        while buckets:
+            _, last, idle_after = next(iter(buckets.values()))
+            if now - last > idle_after or len(buckets) >= self.max_keys_per_shard:
+                buckets.popitem(last=False)
+            else:
+                break
+
+    def rate_for(self, scope, default):
+        return self.overrides.get(scope, default)
+
+    def check(self, key, rate):
+        """Return a 429 response if key is over its rate, else None"""
+        allowed, retry_after = self.hit(key, rate)
+        if allowed:
+            return None
+        response = jsonify({
+            'error': 'rate_limited',
+            'message': f'Rate limit exceeded ({rate})'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+    def limit(self, rate, key_func=remote_address, scope=None):
+        """Decorator limiting a route by key_func (IP by default)"""
+        def decorator(f):
+            name = scope or f.__name__
+            route_rate = self.rate_for(name, rate)
+
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                limited = self.check(f"{name}:{key_func()}", route_rate)
+                if limited is not None:
+                    return limited
+                return f(*args, **kwargs)
+            return decorated
+        return decorator
+
+    def size(self):
+        return sum(len(shard.buckets) for shard in self._shards)
+
+
+limiter = RateLimiter(
+    max_keys=int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000')),
+    idle_ttl=int(os.getenv('RATE_LIMIT_IDLE_TTL', '600'))
+)
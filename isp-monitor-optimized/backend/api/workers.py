@@ -0,0 +1,126 @@
+import cv2
+import logging
+import os
+import time
+from datetime import datetime
+from threading import Thread
+from queue import Queue
+from dotenv import load_dotenv
+
+from database import DetectionDatabase
+from cluster import default_node_id
+from ai_models.pipeline import DetectionPipeline
+from ai_models.quality_controller import QualityController, DEFAULT_PRIORITY
+from ai_models.heatmap import HeatmapEngine
+from clip_recorder import ClipRecorder
+
+load_dotenv()
+
+# Estado compartilhado entre o servidor Flask (app_fixed) e o ASGI (app_async)
+db = DetectionDatabase()
+pipeline = DetectionPipeline(
+    cascade=os.getenv('CASCADE_MODE', 'False') == 'True',
+    escalation_model=os.getenv('CASCADE_ESCALATION_MODEL', 'yolov8m.pt'),
+    escalation_conf=float(os.getenv('CASCADE_ESCALATION_CONF', '0.5')),
+    min_conf=float(os.getenv('CASCADE_MIN_CONF', '0.15')),
+    max_escalated_boxes=int(os.getenv('CASCADE_MAX_BOXES', '4'))
+)
+quality = QualityController(
+    target_latency_ms=float(os.getenv('LATENCY_TARGET_MS', '500'))
+)
+heatmaps = HeatmapEngine(os.getenv('HEATMAP_DIR', 'analytics/heatmaps'))
+clips = ClipRecorder(
+    db,
+    pre_seconds=float(os.getenv('CLIP_PRE_SECONDS', '5')),
+    post_seconds=float(os.getenv('CLIP_POST_SECONDS', '5')),
+    max_total_bytes=int(os.getenv('CLIP_MEMORY_MB', '256')) * 1024 * 1024
+)
+
+NODE_ID = os.getenv('NODE_ID') or default_node_id()
+RUNTIME_PUBLISH_INTERVAL = 1.0  # segundos entre atualizações do status no banco
+
+# Sistema de processamento
+camera_queue = Queue()
+active_cameras = {}
+processing_results = {}
+
+def start_camera(camera_id, rtsp_url):
+    """Agenda o processamento de uma câmera"""
+    active_cameras[camera_id] = True
+    camera_queue.put((camera_id, rtsp_url))
+
+def stop_camera(camera_id):
+    """Sinaliza para o worker encerrar a câmera"""
+    if camera_id in active_cameras:
+        active_cameras[camera_id] = False
+
+def is_camera_running(camera_id):
+    return active_cameras.get(camera_id, False)
+
+def camera_worker():
+    while True:
+        camera_id, rtsp_url = camera_queue.get()
+        if not active_cameras.get(camera_id, False):
+            continue  # parada antes de ser iniciada
+        try:
+            cap = cv2.VideoCapture(rtsp_url)
+            last_published = 0
+            camera = db.get_camera(camera_id) or {}
+            quality.register_camera(camera_id, camera.get('priority', DEFAULT_PRIORITY))
+            # Muda updated_at: o delta do dashboard leva o novo status
+            db.update_camera_status(camera_id, True)
+            
+            while active_cameras.get(camera_id, False):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                
+                # Buffer pré-evento recebe o quadro antes das anotações do pipeline
+                started = time.time()
+                clips.add_frame(camera_id, frame, started)
+                
+                # Controle adaptativo: descarta quadros acima do fps permitido
+                if not quality.should_analyze(camera_id, started):
+                    continue
+                
+                settings = quality.settings_for(camera_id)
+                _, detections = pipeline.process_frame(
+                    frame,
+                    imgsz=settings['imgsz'],
+                    check_logos=quality.should_check_logos(camera_id)
+                )
+                result = db.log_detection(camera_id, frame, detections)
+                if len(detections):
+                    clips.trigger(camera_id, result.inserted_id, started)
+                heatmaps.update(camera_id, detections, frame.shape, started)
+                processing_results[camera_id] = {
+                    'last_update': datetime.now(),
+                    'detections': detections
+                }
+                quality.record(camera_id, time.time() - started)
+                
+                # Status publicado no banco para qualquer nó responder à API
+                if started - last_published >= RUNTIME_PUBLISH_INTERVAL:
+                    db.update_camera_runtime(camera_id, NODE_ID, len(detections))
+                    last_published = started
+                
+        except Exception as e:
+            logging.error(f"Erro câmera {camera_id}: {str(e)}")
+        finally:
+            quality.unregister_camera(camera_id)
+            clips.remove_camera(camera_id)
+            active_cameras.pop(camera_id, None)
+            processing_results.pop(camera_id, None)
+            if 'cap' in locals():
+                cap.release()
+            try:
+                db.update_camera_status(camera_id, False)
+            except Exception as e:
+                logging.error(f"Erro ao atualizar status da câmera {camera_id}: {str(e)}")
+
+def start_workers(num_workers=1):
+    """Inicia as threads de processamento de câmeras"""
+    for _ in range(num_workers):
+        Thread(target=camera_worker, daemon=True).start()
+    heatmaps.start_periodic(int(os.getenv('HEATMAP_PERSIST_INTERVAL', '60')))
+    clips.start_periodic()
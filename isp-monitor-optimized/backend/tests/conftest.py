@@ -0,0 +1,22 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+API_DIR = os.path.join(ROOT, 'backend', 'api')
+
+# Mesmo layout de execução do backend: módulos da API importados pelo nome
+# (ex: `from database import ...`) e ai_models a partir da raiz do projeto
+for path in (ROOT, API_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """DetectionDatabase backed by an in-memory mongomock client"""
+    import database
+    monkeypatch.setattr(database, 'MongoClient', mongomock.MongoClient)
+    return database.DetectionDatabase()
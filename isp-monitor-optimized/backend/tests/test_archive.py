@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+pytest.importorskip('pyarrow')
+from archive import DetectionArchive  # noqa: E402
+
+
+def insert(db, timestamp, camera_id='cam', isp=1, clip=None):
+    oid = ObjectId.from_datetime(timestamp)
+    doc = {
+        '_id': oid,
+        'camera_id': camera_id,
+        'timestamp': timestamp,
+        'isp_vehicle_count': isp,
+        'total_vehicles': 1,
+        'vehicles': [{'bbox': [0, 0, 10, 10], 'confidence': 0.9, 'class_id': 2,
+                      'is_isp': bool(isp)}]
+    }
+    if clip:
+        doc['clip'] = clip
+    db.detections.insert_one(doc)
+    return oid
+
+
+def test_compact_flushes_each_day_before_the_next(db, tmp_path):
+    for day in (1, 2, 3):
+        for hour in range(4):
+            insert(db, datetime(2026, 1, day, hour), camera_id=f'cam-{hour % 2}')
+    archive = DetectionArchive(db, root=str(tmp_path), batch_size=100)
+
+    buffered = []
+    flush = archive._flush
+    archive._flush = lambda key, docs: (buffered.append(key), flush(key, docs))[1]
+
+    assert archive.compact(now=datetime(2026, 3, 1)) == 12
+    assert db.detections.count_documents({}) == 0
+    assert [day for _, day in buffered] == ['2026-01-01'] * 2 + ['2026-01-02'] * 2 + ['2026-01-03'] * 2
+    assert sum(row['detections'] for row in archive.daily_counts()) == 12
+
+
+def test_clip_metadata_is_archived(db, tmp_path):
+    timestamp = datetime(2026, 1, 2, 10)
+    oid = insert(db, timestamp, clip={'path': 'cam/x.mp4', 'start': timestamp,
+                                      'end': timestamp, 'frames': 100})
+    archive = DetectionArchive(db, root=str(tmp_path))
+    archive.compact(now=datetime(2026, 3, 1))
+
+    created = oid.generation_time.replace(tzinfo=None)
+    found = archive.get_detection(str(oid), created, columns=['clip_path', 'clip_frames'])
+    assert found == {'clip_path': 'cam/x.mp4', 'clip_frames': 100}
+    assert archive.get_detection(str(ObjectId()), created) is None
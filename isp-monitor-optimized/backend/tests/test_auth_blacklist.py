@@ -0,0 +1,42 @@
+import time
+
+import jwt
+import pytest
+
+import auth
+
+
+@pytest.fixture(autouse=True)
+def empty_blacklist(monkeypatch):
+    monkeypatch.setattr(auth, 'token_blacklist', {})
+    monkeypatch.setattr(auth, '_blacklist_expiry', [])
+
+
+def make_token(user_id, exp):
+    return jwt.encode({'user_id': user_id, 'exp': int(exp), 'type': 'access'},
+                      auth.SECRET_KEY, algorithm='HS256')
+
+
+def test_logout_blacklists_token():
+    token = make_token('alice', time.time() + 60)
+    assert auth.logout(token)
+    assert token in auth.token_blacklist
+    assert auth.verify_token(token) is None
+
+
+def test_logout_is_idempotent():
+    token = make_token('alice', time.time() + 60)
+    auth.logout(token)
+    auth.logout(token)
+    assert len(auth._blacklist_expiry) == 1
+
+
+def test_prune_drops_only_expired_tokens():
+    now = time.time()
+    tokens = {exp: make_token(f'user-{exp}', now + exp) for exp in (10, 20, 30)}
+    for token in tokens.values():
+        auth.logout(token)
+
+    auth.prune_token_blacklist(now + 25)
+    assert set(auth.token_blacklist) == {tokens[30]}
+    assert [token for _, token in auth._blacklist_expiry] == [tokens[30]]
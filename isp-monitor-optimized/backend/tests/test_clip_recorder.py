@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from clip_recorder import ClipRecorder
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (360, 640, 3), dtype=np.uint8)
+
+
+def record(recorder, frame, start, seconds, camera_id='cam'):
+    timestamp = start
+    while timestamp < start + seconds:
+        recorder.add_frame(camera_id, frame, timestamp)
+        timestamp += 1.0 / recorder.fps
+    return timestamp
+
+
+def test_queued_clips_count_against_global_budget(tmp_path, frame):
+    recorder = ClipRecorder(output_dir=str(tmp_path), pre_seconds=1, post_seconds=1,
+                            max_bytes_per_camera=2 * MB, max_total_bytes=2 * MB)
+    gate = threading.Event()
+    write_clip = recorder._write_clip
+    recorder._write_clip = lambda clip: (gate.wait(5), write_clip(clip))
+
+    timestamp = record(recorder, frame, 0, 2)
+    recorder.trigger('cam', 'det-1', timestamp)
+    record(recorder, frame, timestamp, 2)
+
+    status = recorder.get_status()
+    assert status['queued_bytes'] > 0
+    assert status['buffered_bytes'] + status['pending_bytes'] + status['queued_bytes'] <= 2 * MB
+    assert recorder._camera_budget() == 2 * MB - status['queued_bytes']
+
+    gate.set()
+    for _ in range(50):
+        if recorder.get_status()['clips_written']:
+            break
+        time.sleep(0.05)
+    status = recorder.get_status()
+    assert status['clips_written'] == 1
+    assert status['queued_bytes'] == 0
+    assert os.path.exists(tmp_path / 'cam' / 'det-1.mp4')
+
+
+def test_sweep_removes_expired_clips(tmp_path):
+    recorder = ClipRecorder(output_dir=str(tmp_path), retention_days=1)
+    camera_dir = tmp_path / 'cam'
+    camera_dir.mkdir()
+    old = camera_dir / 'old.mp4'
+    new = camera_dir / 'new.mp4'
+    old.write_bytes(b'old')
+    new.write_bytes(b'new')
+    two_days_ago = time.time() - 2 * 86400
+    os.utime(old, (two_days_ago, two_days_ago))
+
+    assert recorder.sweep() == 1
+    assert not old.exists()
+    assert new.exists()
+    assert recorder.get_status()['clips_expired'] == 1
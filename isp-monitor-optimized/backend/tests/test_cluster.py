@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from cluster import CameraLeaseManager
+
+
+def add_cameras(db, count, priority=1):
+    for i in range(count):
+        db.add_camera(f'cam-{i}', '', f'rtsp://cam-{i}', priority=priority)
+
+
+def make_manager(db, node_id, **kwargs):
+    events = []
+    manager = CameraLeaseManager(
+        db, node_id=node_id, lease_ttl=30,
+        on_acquire=lambda camera: events.append(('acquire', camera['camera_id'])),
+        on_release=lambda camera_id: events.append(('release', camera_id)),
+        **kwargs
+    )
+    return manager, events
+
+
+def owners(db):
+    return {c['camera_id']: c.get('lease_owner') for c in db.cameras.find()}
+
+
+def test_fair_share():
+    manager = CameraLeaseManager(db=None, node_id='a', max_cameras=5)
+    assert manager.fair_share(2, 4) == 2
+    assert manager.fair_share(3, 4) == 2
+    assert manager.fair_share(1, 20) == 5
+    assert manager.fair_share(0, 3) == 3
+
+
+def test_single_node_claims_up_to_max_cameras(db):
+    add_cameras(db, 4)
+    manager, events = make_manager(db, 'a', max_cameras=3)
+
+    manager.heartbeat()
+    assert len(manager.owned) == 3
+    assert [e[0] for e in events] == ['acquire'] * 3
+    assert list(owners(db).values()).count('a') == 3
+
+
+def test_cameras_are_split_between_nodes(db):
+    add_cameras(db, 4)
+    a, _ = make_manager(db, 'a')
+    b, _ = make_manager(db, 'b')
+
+    a.heartbeat()
+    assert len(a.owned) == 4
+
+    # b entra: a libera o excesso no próximo heartbeat e b assume
+    b.heartbeat()
+    a.heartbeat()
+    b.heartbeat()
+    assert len(a.owned) == 2
+    assert len(b.owned) == 2
+    assert set(a.owned).isdisjoint(b.owned)
+
+
+def test_excess_releases_lowest_priority_first(db):
+    db.add_camera('high', '', 'rtsp://high', priority=5)
+    db.add_camera('low', '', 'rtsp://low', priority=1)
+    a, events = make_manager(db, 'a')
+    a.heartbeat()
+    assert set(a.owned) == {'high', 'low'}
+
+    db.register_node('b')
+    a.heartbeat()
+    assert set(a.owned) == {'high'}
+    assert ('release', 'low') in events
+
+
+def test_expired_leases_are_taken_over(db):
+    add_cameras(db, 4)
+    a, _ = make_manager(db, 'a')
+    b, _ = make_manager(db, 'b')
+    a.heartbeat()
+    b.heartbeat()
+    a.heartbeat()
+    b.heartbeat()
+    assert len(b.owned) == 2
+
+    # b morre: heartbeat e leases expiram sem renovação
+    past = datetime.utcnow() - timedelta(seconds=60)
+    db.nodes.update_one({'node_id': 'b'}, {'$set': {'heartbeat': past}})
+    db.cameras.update_many({'lease_owner': 'b'}, {'$set': {'lease_expires': past}})
+
+    a.heartbeat()
+    assert len(a.owned) == 4
+    assert set(owners(db).values()) == {'a'}
+
+
+def test_lost_lease_stops_camera_locally(db):
+    add_cameras(db, 1)
+    a, events = make_manager(db, 'a')
+    a.heartbeat()
+
+    db.cameras.update_one({'camera_id': 'cam-0'}, {'$set': {'lease_owner': 'b'}})
+    db.register_node('b')
+    a.heartbeat()
+    assert 'cam-0' not in a.owned
+    assert ('release', 'cam-0') in events
+
+
+def test_dead_worker_is_restarted(db):
+    add_cameras(db, 1)
+    a, events = make_manager(db, 'a', is_running=lambda camera_id: False)
+    a.heartbeat()
+    a.heartbeat()
+    assert events.count(('acquire', 'cam-0')) == 2
+
+
+def test_stop_releases_leases_and_node(db):
+    add_cameras(db, 2)
+    a, _ = make_manager(db, 'a')
+    a.heartbeat()
+
+    a.stop()
+    assert not a.owned
+    assert set(owners(db).values()) == {None}
+    assert db.nodes.count_documents({'node_id': 'a'}) == 0
+
+
+def test_start_creates_node_ttl_index(db):
+    a, _ = make_manager(db, 'a', heartbeat_interval=3600)
+    a.start()
+    a.stop()
+
+    indexes = {tuple(info['key']): info for info in db.nodes.index_information().values()}
+    assert indexes[(('heartbeat', 1),)]['expireAfterSeconds'] >= a.lease_ttl
@@ -0,0 +1,131 @@
+import gzip
+import json
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import dashboard
+from dashboard import DashboardService
+
+
+@pytest.fixture
+def service(db, monkeypatch):
+    # Sem cache da cabeça: cada build enxerga o estado atual do banco
+    monkeypatch.setattr(dashboard, 'HEAD_CACHE_TTL', -1)
+    return DashboardService(db)
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    updated_at = datetime(2026, 5, 1, 12, 30, 15, 123000)
+    cursor = DashboardService.encode_cursor(oid, updated_at)
+
+    assert cursor == f"{oid}.{1777638615123}"
+    assert DashboardService.decode_cursor(cursor) == (oid, updated_at)
+
+
+def test_cursor_truncates_to_milliseconds():
+    updated_at = datetime(2026, 5, 1, 12, 30, 15, 123999)
+    cursor = DashboardService.encode_cursor(None, updated_at)
+    assert DashboardService.decode_cursor(cursor) == (None, updated_at.replace(microsecond=123000))
+
+
+def test_empty_cursor():
+    assert DashboardService.encode_cursor(None, None) == '.0'
+    assert DashboardService.decode_cursor('.0') == (None, None)
+
+
+@pytest.mark.parametrize('cursor', ['nope.1', 'abc', f'{ObjectId()}.x'])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        DashboardService.decode_cursor(cursor)
+
+
+def test_snapshot_then_not_modified(service, db):
+    db.add_camera('cam', 'Portão', 'rtsp://cam')
+    payload, cursor = service.build()
+    assert payload['full']
+    assert payload['cursor'] == cursor
+    assert [c['camera_id'] for c in payload['cameras']] == ['cam']
+
+    assert service.build(cursor) == (None, cursor)
+
+
+def test_camera_change_is_sent_as_delta(service, db):
+    db.add_camera('cam', '', 'rtsp://cam')
+    _, cursor = service.build()
+
+    time.sleep(0.002)  # updated_at tem resolução de milissegundos no MongoDB
+    db.update_camera_status('cam', False)
+    payload, new_cursor = service.build(cursor)
+    assert not payload['full']
+    assert [c['camera_id'] for c in payload['cameras']] == ['cam']
+    assert new_cursor != cursor
+    assert service.build(new_cursor)[0] is None
+
+
+def test_encode_body_gzips_large_payloads():
+    payload = {'detections': [{'_id': ObjectId(), 'timestamp': datetime(2026, 1, 1)}] * 50}
+    body, encoding = DashboardService.encode_body(payload, 'gzip, deflate')
+    assert encoding == 'gzip'
+    decoded = json.loads(gzip.decompress(body))
+    assert decoded['detections'][0]['timestamp'] == '2026-01-01T00:00:00'
+
+    small, encoding = DashboardService.encode_body({'a': 1}, 'gzip')
+    assert encoding is None
+    assert json.loads(small) == {'a': 1}
+
+
+def log(db, camera_id, isp):
+    vehicles = [{'bbox': [0, 0, 10, 10], 'confidence': 0.9, 'class_id': 2, 'is_isp': isp}]
+    return db.log_detection(camera_id, None, vehicles).inserted_id
+
+
+def test_frames_without_isp_vehicles_keep_not_modified(service, db):
+    log(db, 'cam', isp=True)
+    payload, cursor = service.build()
+    assert len(payload['detections']) == 1
+
+    for _ in range(5):
+        log(db, 'cam', isp=False)
+    assert service.build(cursor) == (None, cursor)
+
+
+def test_delta_only_contains_isp_detections(service, db):
+    _, cursor = service.build()
+    log(db, 'cam', isp=False)
+    isp_id = log(db, 'cam', isp=True)
+    log(db, 'cam', isp=False)
+
+    payload, new_cursor = service.build(cursor)
+    assert [d['_id'] for d in payload['detections']] == [isp_id]
+    assert payload['counters_delta']['isp_alerts'] == 1
+    assert not payload['truncated']
+    assert new_cursor == service.head_cursor()
+
+
+def test_stale_cursor_moves_to_head(service, db):
+    log(db, 'cam', isp=True)
+    _, head = service.build()
+    stale = DashboardService.encode_cursor(log(db, 'cam', isp=False), None)
+
+    payload, cursor = service.build(stale)
+    assert payload is None
+    assert cursor.split('.')[0] == head.split('.')[0]
+
+
+def test_truncated_delta_resumes_from_last_detection(service, db, monkeypatch):
+    monkeypatch.setattr(dashboard, 'MAX_DELTA_DETECTIONS', 2)
+    _, cursor = service.build()
+    ids = [log(db, 'cam', isp=True) for _ in range(3)]
+
+    payload, cursor = service.build(cursor)
+    assert payload['truncated']
+    assert [d['_id'] for d in payload['detections']] == ids[:2]
+
+    payload, cursor = service.build(cursor)
+    assert not payload['truncated']
+    assert [d['_id'] for d in payload['detections']] == ids[2:]
+    assert service.build(cursor)[0] is None
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from ai_models.vehicle_detection_utils import DETECTION_DTYPE, VehicleDetectionUtils
+
+
+class FakeTensor:
+    """Só o necessário de torch.Tensor: .cpu().numpy()"""
+
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.data
+
+
+class FakeBoxes:
+    """Mesmo contrato de ultralytics Boxes usado por to_records"""
+
+    def __init__(self, data):
+        self.data = FakeTensor(data)
+
+    def __len__(self):
+        return len(self.data.data)
+
+
+def result(rows):
+    return SimpleNamespace(boxes=FakeBoxes(rows))
+
+
+def test_to_records_reads_six_column_boxes():
+    records = VehicleDetectionUtils.to_records([
+        result([[10.7, 20.2, 110.9, 220.5, 0.9, 2],
+                [0, 0, 50, 60, 0.35, 7]])
+    ])
+
+    assert records.dtype == DETECTION_DTYPE
+    assert records['bbox'].tolist() == [[10, 20, 110, 220], [0, 0, 50, 60]]
+    assert records['confidence'].tolist() == [np.float32(0.9), np.float32(0.35)]
+    assert records['class_id'].tolist() == [2, 7]
+    assert not records['is_isp'].any()
+
+
+def test_to_records_skips_track_id_in_seven_column_boxes():
+    # Com tracking: [x1, y1, x2, y2, track_id, conf, cls]
+    records = VehicleDetectionUtils.to_records([
+        result([[1, 2, 3, 4, 42, 0.8, 5]])
+    ])
+
+    assert records['bbox'].tolist() == [[1, 2, 3, 4]]
+    assert records['confidence'][0] == np.float32(0.8)
+    assert records['class_id'][0] == 5
+
+
+def test_to_records_concatenates_results_and_ignores_empty_ones():
+    records = VehicleDetectionUtils.to_records([
+        result([[0, 0, 10, 10, 0.5, 2]]),
+        SimpleNamespace(boxes=None),
+        result(np.zeros((0, 6))),
+        result([[5, 5, 15, 15, 0.6, 3]])
+    ])
+    assert records['class_id'].tolist() == [2, 3]
+
+
+def test_to_records_empty_result():
+    for results in ([], [SimpleNamespace(boxes=None)], [result(np.zeros((0, 6)))]):
+        records = VehicleDetectionUtils.to_records(results)
+        assert records.dtype == DETECTION_DTYPE
+        assert len(records) == 0
+        assert VehicleDetectionUtils.to_dicts(records) == []
+
+
+def test_to_dicts_rounds_float32_confidence():
+    records = np.zeros(2, dtype=DETECTION_DTYPE)
+    records['bbox'] = [[1, 2, 3, 4], [5, 6, 7, 8]]
+    records['confidence'] = [0.9, 0.123456]
+    records['class_id'] = [2, 7]
+    records['is_isp'] = [True, False]
+
+    detections = VehicleDetectionUtils.to_dicts(records, class_names={2: 'car'})
+
+    assert detections == [
+        {'bbox': [1, 2, 3, 4], 'confidence': 0.9, 'class_id': 2,
+         'is_isp': True, 'class_name': 'car'},
+        {'bbox': [5, 6, 7, 8], 'confidence': 0.1235, 'class_id': 7,
+         'is_isp': False, 'class_name': '7'}
+    ]
+    # Tipos nativos, prontos para BSON/JSON
+    assert type(detections[0]['confidence']) is float
+    assert type(detections[0]['class_id']) is int
+    assert type(detections[0]['is_isp']) is bool
@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+from ai_models.heatmap import MAX_FRAME_GAP, HeatmapEngine
+from ai_models.vehicle_detection_utils import DETECTION_DTYPE
+
+FRAME_SHAPE = (360, 640, 3)  # células de 10x10 px na grade 36x64
+
+
+def boxes(*bboxes):
+    records = np.zeros(len(bboxes), dtype=DETECTION_DTYPE)
+    records['bbox'] = np.reshape(bboxes, (-1, 4))
+    records['is_isp'] = True
+    return records
+
+
+def test_update_maps_bottom_centre_to_cell(tmp_path):
+    engine = HeatmapEngine(root=str(tmp_path))
+    # Centro inferior (50, 120) -> célula (12, 5); y = 360 (borda inferior) vai para a última linha
+    engine.update('cam', boxes([0, 0, 100, 120], [600, 300, 640, 360]), FRAME_SHAPE, now=0)
+
+    hits = engine.query('cam', 0, 3600, kind='hits')
+    assert hits[12, 5] == 1
+    assert hits[35, 62] == 1
+    assert hits.sum() == 2
+
+
+def test_dwell_is_capped_by_max_frame_gap(tmp_path):
+    engine = HeatmapEngine(root=str(tmp_path))
+    vehicle = boxes([0, 0, 100, 120])
+
+    engine.update('cam', vehicle, FRAME_SHAPE, now=100.0)
+    engine.update('cam', vehicle, FRAME_SHAPE, now=100.5)
+    engine.update('cam', vehicle, FRAME_SHAPE, now=160.5)  # queda do stream
+
+    dwell = engine.query('cam', 0, 3600)
+    assert dwell[12, 5] == np.float32(0.5 + MAX_FRAME_GAP)
+    assert engine.query('cam', 0, 3600, kind='hits')[12, 5] == 3
+
+
+def test_empty_frames_advance_the_clock(tmp_path):
+    engine = HeatmapEngine(root=str(tmp_path))
+    engine.update('cam', boxes(), FRAME_SHAPE, now=100.0)
+    engine.update('cam', boxes([0, 0, 100, 120]), FRAME_SHAPE, now=100.2)
+
+    assert engine.query('cam', 0, 3600)[12, 5] == np.float32(0.2)
+
+
+def test_persist_evict_and_query_across_memory_and_disk(tmp_path):
+    engine = HeatmapEngine(root=str(tmp_path), bucket_seconds=60, memory_buckets=2)
+    vehicle = boxes([0, 0, 100, 120])
+    for minute in range(4):
+        engine.update('cam', vehicle, FRAME_SHAPE, now=minute * 60)
+
+    engine.persist()
+    assert sorted(engine.buckets['cam']) == [120, 180]
+    assert engine._stored_buckets('cam') == {0, 60, 120, 180}
+    assert not list(tmp_path.glob('cam/*.tmp.npz'))
+
+    # Intervalo cobre um bucket só em disco e um ainda em memória
+    assert engine.query('cam', 60, 180, kind='hits')[12, 5] == 2
+    assert engine.query('cam', 0, 240, kind='hits')[12, 5] == 4
+
+    # Nova instância lê tudo do disco e continua acumulando no bucket existente
+    reloaded = HeatmapEngine(root=str(tmp_path), bucket_seconds=60, memory_buckets=2)
+    reloaded.update('cam', vehicle, FRAME_SHAPE, now=30)
+    assert reloaded.query('cam', 0, 240, kind='hits')[12, 5] == 5
+    assert reloaded.query('other', 0, 240).sum() == 0
+
+
+def test_render_png_on_empty_grid(tmp_path):
+    engine = HeatmapEngine(root=str(tmp_path))
+    png = engine.render_png(engine.query('cam', 0, 3600), size=(64, 36))
+
+    image = cv2.imdecode(np.frombuffer(png, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape == (36, 64, 3)
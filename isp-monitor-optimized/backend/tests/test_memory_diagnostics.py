@@ -0,0 +1,57 @@
+import time
+import tracemalloc
+
+import pytest
+
+import memory_diagnostics
+from memory_diagnostics import MemoryDiagnostics, estimate_size
+
+
+@pytest.fixture
+def diagnostics():
+    diagnostics = MemoryDiagnostics(interval=3600, top_n=5)
+    yield diagnostics
+    diagnostics.stop()
+
+
+def test_tracemalloc_is_off_by_default(diagnostics):
+    diagnostics.start()
+    assert not tracemalloc.is_tracing()
+    assert not diagnostics.report()['tracemalloc']['continuous']
+
+
+def test_trace_window_reports_growth_then_stops(diagnostics, monkeypatch):
+    monkeypatch.setattr(memory_diagnostics, 'MAX_TRACE_WINDOW', 1)
+    assert diagnostics.start_trace_window(60)
+    assert tracemalloc.is_tracing()
+    assert not diagnostics.start_trace_window(1)  # uma janela por vez
+
+    leak = [bytearray(1024) for _ in range(1000)]
+    for _ in range(40):
+        if not tracemalloc.is_tracing():
+            break
+        time.sleep(0.05)
+
+    report = diagnostics.report()['tracemalloc']
+    assert not report['enabled']
+    assert report['window_until'] is None
+    assert report['top_growth'][0]['size_diff_kb'] >= 1000
+    assert len(leak) == 1000
+
+
+def test_gauges_and_array_sampling(diagnostics):
+    diagnostics.register_gauge('items', list(range(100)))
+    diagnostics.register_gauge('count', lambda: 7)
+    diagnostics.sample_every = 2
+    for _ in range(3):
+        diagnostics.track_arrays('stage', [])
+
+    report = diagnostics.report()
+    assert report['gauges']['items']['len'] == 100
+    assert report['gauges']['count'] == 7
+    assert report['pipeline_buffers']['stage']['calls'] == 3
+    assert report['pipeline_buffers']['stage']['samples'] == 2
+
+
+def test_estimate_size_grows_with_items():
+    assert estimate_size({i: str(i) for i in range(1000)}) > estimate_size({0: '0'})
@@ -0,0 +1,187 @@
+import importlib
+import sys
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+from ai_models.vehicle_detection_utils import DETECTION_DTYPE
+
+# Quadro sintético: canal 0 = probabilidade do logo (x100), canal 1 marca os
+# veículos que o modelo medium encontra, canal 2 = confiança do medium (x100)
+FRAME_SHAPE = (1080, 1920, 3)
+
+
+def records(*rows):
+    """rows: (bbox, confidence)"""
+    out = np.zeros(len(rows), dtype=DETECTION_DTYPE)
+    for i, (bbox, confidence) in enumerate(rows):
+        out[i]['bbox'] = bbox
+        out[i]['confidence'] = confidence
+    return out
+
+
+def paint(frame, bbox, logo=0.0, medium=None):
+    x1, y1, x2, y2 = bbox
+    frame[y1:y2, x1:x2, 0] = int(logo * 100)
+    if medium is not None:
+        frame[y1:y2, x1:x2, 1] = 255
+        frame[y1:y2, x1:x2, 2] = int(medium * 100)
+
+
+class NanoStub:
+    def __init__(self):
+        self.records = records()
+
+    def detect(self, frame, imgsz=None, conf=None):
+        return self.records.copy()
+
+
+class MediumStub:
+    """Finds the painted vehicles inside whatever region it is given"""
+    calls = []
+
+    def __init__(self, model_path, conf_threshold=0.5):
+        pass
+
+    def detect(self, frame, imgsz=None):
+        self.calls.append((frame.shape[:2], imgsz))
+        mask = np.ascontiguousarray(frame[..., 1] > 0).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        rows = []
+        for x, y, w, h, _ in stats[1:count]:
+            confidence = frame[y:y + h, x:x + w, 2].max() / 100.0
+            rows.append(([x, y, x + w, y + h], confidence))
+        return records(*rows)
+
+
+class LogoStub:
+    def __init__(self, model_path=None):
+        pass
+
+    def predict_proba(self, crop):
+        return crop[..., 0].max() / 100.0
+
+
+@pytest.fixture
+def pipeline_module(monkeypatch):
+    # Sem ultralytics/torch no ambiente de teste: módulos vazios só para o import
+    for name, attr in (('ultralytics', 'YOLO'), ('ai_models.logo_recognition', 'LogoRecognizer')):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            stub = types.ModuleType(name)
+            setattr(stub, attr, None)
+            monkeypatch.setitem(sys.modules, name, stub)
+    module = importlib.import_module('ai_models.pipeline')
+    monkeypatch.setattr(module, 'VehicleDetector', lambda model_path: NanoStub())
+    monkeypatch.setattr(module, 'VehicleDetectorCore', MediumStub)
+    monkeypatch.setattr(module, 'LogoRecognizer', LogoStub)
+    MediumStub.calls = []
+    return module
+
+
+@pytest.fixture
+def frame():
+    return np.zeros(FRAME_SHAPE, dtype=np.uint8)
+
+
+def make_pipeline(module, nano, **kwargs):
+    pipeline = module.DetectionPipeline(cascade=True, **kwargs)
+    pipeline.vehicle_detector.records = nano
+    return pipeline
+
+
+def test_confident_boxes_skip_escalation(pipeline_module, frame):
+    paint(frame, [100, 100, 300, 250], logo=0.9)
+    paint(frame, [600, 100, 800, 250], logo=0.1)
+    pipeline = make_pipeline(pipeline_module, records(([100, 100, 300, 250], 0.9),
+                                                      ([600, 100, 800, 250], 0.8)))
+
+    vehicles = pipeline._detect_cascade(frame, None, True)
+    assert vehicles['is_isp'].tolist() == [True, False]
+    assert MediumStub.calls == []
+    stats = pipeline.get_cascade_stats()
+    assert stats['frames'] == 1
+    assert stats['escalated_frames'] == 0
+    assert stats['escalation_rate'] == 0
+
+
+def test_uncertain_isp_keeps_nano_box_when_medium_finds_nothing(pipeline_module, frame):
+    # Dentro da faixa de incerteza: escala, mas is_isp usa o limiar de 0.5
+    paint(frame, [100, 100, 300, 250], logo=0.6)
+    paint(frame, [600, 100, 800, 250], logo=0.4)
+    pipeline = make_pipeline(pipeline_module, records(([100, 100, 300, 250], 0.9),
+                                                      ([600, 100, 800, 250], 0.8)))
+
+    vehicles = pipeline._detect_cascade(frame, None, True)
+    assert vehicles['bbox'].tolist() == [[100, 100, 300, 250], [600, 100, 800, 250]]
+    assert vehicles['is_isp'].tolist() == [True, False]
+    assert len(MediumStub.calls) == 2
+    stats = pipeline.get_cascade_stats()
+    assert stats['uncertain_isp_boxes'] == 2
+    assert stats['escalated_boxes'] == 2
+
+
+def test_refined_box_replaces_nano_box_in_frame_coordinates(pipeline_module, frame):
+    paint(frame, [1210, 610, 1290, 680], logo=0.9, medium=0.75)
+    pipeline = make_pipeline(pipeline_module, records(([1200, 600, 1280, 670], 0.3)))
+
+    vehicles = pipeline._detect_cascade(frame, None, True)
+    assert vehicles['bbox'].tolist() == [[1210, 610, 1290, 680]]
+    assert vehicles['confidence'][0] == np.float32(0.75)
+    assert vehicles['is_isp'].tolist() == [True]
+    # Recorte pequeno roda no tamanho mínimo, não no quadro inteiro
+    assert MediumStub.calls == [((122, 136), pipeline_module.MIN_CROP_IMGSZ)]
+    assert pipeline.get_cascade_stats()['crop_escalations'] == 1
+
+
+def test_selection_prefers_uncertain_isp_then_confidence_up_to_cap(pipeline_module, frame):
+    uncertain = [100, 100, 300, 250]
+    low_high = [600, 600, 700, 700]
+    low_low = [1200, 600, 1300, 700]
+    paint(frame, uncertain, logo=0.5, medium=0.9)
+    paint(frame, low_high, medium=0.8)
+    paint(frame, low_low, medium=0.7)
+    pipeline = make_pipeline(pipeline_module,
+                             records((low_low, 0.2), (low_high, 0.4), (uncertain, 0.9)),
+                             max_escalated_boxes=2)
+
+    vehicles = pipeline._detect_cascade(frame, None, True)
+    # Além do limite, caixas de baixa confiança são descartadas
+    assert sorted(vehicles['bbox'].tolist()) == [uncertain, low_high]
+    assert len(MediumStub.calls) == 2
+    stats = pipeline.get_cascade_stats()
+    assert stats['low_conf_boxes'] == 2
+    assert stats['uncertain_isp_boxes'] == 1
+    assert stats['escalated_boxes'] == 2
+
+
+def test_overlapping_crops_are_deduped(pipeline_module, frame):
+    paint(frame, [420, 400, 520, 500], medium=0.8)
+    pipeline = make_pipeline(pipeline_module, records(([400, 400, 500, 500], 0.3),
+                                                      ([440, 400, 540, 500], 0.25)))
+
+    vehicles = pipeline._detect_cascade(frame, None, False)
+    assert vehicles['bbox'].tolist() == [[420, 400, 520, 500]]
+    assert len(MediumStub.calls) == 2
+
+
+def test_large_boxes_escalate_full_frame_once(pipeline_module, frame):
+    confident = [1500, 50, 1700, 200]
+    paint(frame, confident, medium=0.9)
+    paint(frame, [50, 50, 850, 850], medium=0.8)
+    pipeline = make_pipeline(pipeline_module, records((confident, 0.9),
+                                                      ([0, 0, 900, 900], 0.3),
+                                                      ([1000, 300, 1900, 1000], 0.2)))
+
+    vehicles = pipeline._detect_cascade(frame, 640, False)
+    assert MediumStub.calls == [(FRAME_SHAPE[:2], 640)]
+    # O medium também redetecta a caixa confiante: mantida uma única vez
+    assert sorted(vehicles['bbox'].tolist()) == [[50, 50, 850, 850], confident]
+    stats = pipeline.get_cascade_stats()
+    assert stats['full_escalations'] == 1
+    assert stats['crop_escalations'] == 0
+    assert stats['escalated_frames'] == 1
+    assert stats['escalation_rate'] == 1
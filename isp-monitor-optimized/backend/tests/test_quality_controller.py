@@ -0,0 +1,129 @@
+from ai_models.quality_controller import QualityController, QUALITY_LEVELS
+
+
+def make_controller(**kwargs):
+    kwargs.setdefault('target_latency_ms', 100)
+    kwargs.setdefault('cooldown', 0)
+    kwargs.setdefault('smoothing', 1.0)
+    return QualityController(**kwargs)
+
+
+def test_unknown_camera_gets_full_quality():
+    controller = make_controller()
+    assert controller.settings_for('missing') == QUALITY_LEVELS[0]
+    assert controller.should_analyze('missing')
+    assert controller.should_check_logos('missing')
+
+
+def test_should_analyze_respects_level_fps():
+    controller = make_controller()
+    controller.register_camera('cam')
+    controller.cameras['cam']['level'] = 2  # 5 fps
+
+    assert controller.should_analyze('cam', now=10.0)
+    assert not controller.should_analyze('cam', now=10.1)
+    assert controller.should_analyze('cam', now=10.25)
+
+
+def test_logo_check_follows_level_interval():
+    controller = make_controller()
+    controller.register_camera('cam')
+    controller.cameras['cam']['level'] = 2  # a cada 3 quadros
+
+    checks = []
+    for frame in range(6):
+        controller.cameras['cam']['frames'] = frame
+        checks.append(controller.should_check_logos('cam'))
+    assert checks == [True, False, False, True, False, False]
+
+
+def test_degrades_lowest_priority_first():
+    controller = make_controller()
+    controller.register_camera('important', priority=5)
+    controller.register_camera('minor', priority=1)
+
+    controller.record('important', 0.3)
+    assert controller.cameras['minor']['level'] == 1
+    assert controller.cameras['important']['level'] == 0
+    assert controller.decisions[-1]['action'] == 'degrade'
+
+
+def test_degradation_is_spread_across_equal_priority():
+    controller = make_controller()
+    for camera_id in ('a', 'b', 'c'):
+        controller.register_camera(camera_id)
+
+    for _ in range(3):
+        controller.record('a', 0.3)
+    assert [controller.cameras[c]['level'] for c in ('a', 'b', 'c')] == [1, 1, 1]
+
+    controller.record('a', 0.3)
+    assert sorted(s['level'] for s in controller.cameras.values()) == [1, 1, 2]
+
+
+def test_low_priority_is_fully_degraded_before_high_priority():
+    controller = make_controller()
+    controller.register_camera('important', priority=5)
+    controller.register_camera('minor', priority=1)
+
+    for _ in range(len(QUALITY_LEVELS)):
+        controller.record('important', 0.3)
+    assert controller.cameras['minor']['level'] == len(QUALITY_LEVELS) - 1
+    assert controller.cameras['important']['level'] == 1
+
+
+def test_restores_highest_priority_first():
+    controller = make_controller()
+    controller.register_camera('important', priority=5)
+    controller.register_camera('minor', priority=1)
+    controller.cameras['important']['level'] = 2
+    controller.cameras['minor']['level'] = 2
+
+    controller.record('minor', 0.01)
+    assert controller.cameras['important']['level'] == 1
+    assert controller.cameras['minor']['level'] == 2
+    assert controller.decisions[-1]['action'] == 'restore'
+
+
+def test_restoration_is_spread_across_equal_priority():
+    controller = make_controller()
+    for camera_id, level in (('a', 1), ('b', 2), ('c', 3)):
+        controller.register_camera(camera_id)
+        controller.cameras[camera_id]['level'] = level
+
+    for _ in range(3):
+        controller.record('a', 0.01)
+    assert [controller.cameras[c]['level'] for c in ('a', 'b', 'c')] == [1, 1, 1]
+
+
+def test_no_change_inside_headroom_band():
+    controller = make_controller(headroom=0.7)
+    controller.register_camera('cam')
+    controller.cameras['cam']['level'] = 1
+
+    controller.record('cam', 0.085)
+    assert controller.cameras['cam']['level'] == 1
+    assert not controller.decisions
+
+
+def test_cooldown_limits_changes():
+    controller = make_controller(cooldown=3600)
+    controller.register_camera('a')
+    controller.register_camera('b')
+
+    controller.record('a', 0.3)
+    controller.record('a', 0.3)
+    assert len(controller.decisions) == 1
+
+
+def test_register_keeps_state_and_unregister_drops_it():
+    controller = make_controller()
+    controller.register_camera('cam')
+    controller.cameras['cam']['level'] = 2
+
+    controller.register_camera('cam', priority=3)
+    assert controller.cameras['cam']['level'] == 2
+    assert controller.get_status()['cameras']['cam']['priority'] == 3
+
+    controller.unregister_camera('cam')
+    assert 'cam' not in controller.get_status()['cameras']
@@ -0,0 +1,125 @@
+import pytest
+from flask import Flask
+
+import rate_limit
+from rate_limit import RateLimiter, parse_rate
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', fake)
+    return fake
+
+
+def test_parse_rate():
+    assert parse_rate('100 per minute') == (100, 100 / 60)
+    assert parse_rate('5 per seconds') == (5, 5.0)
+    assert parse_rate(' 2 per hour ') == (2, 2 / 3600)
+
+
+def test_bucket_allows_capacity_then_denies(clock):
+    limiter = RateLimiter(shards=4, overrides={})
+    for _ in range(3):
+        assert limiter.hit('ip', '3 per minute') == (True, 0)
+
+    allowed, retry_after = limiter.hit('ip', '3 per minute')
+    assert not allowed
+    assert retry_after == pytest.approx(20.0)
+
+
+def test_bucket_refills_over_time(clock):
+    limiter = RateLimiter(shards=4, overrides={})
+    for _ in range(3):
+        limiter.hit('ip', '3 per minute')
+    assert not limiter.hit('ip', '3 per minute')[0]
+
+    clock.now += 20
+    assert limiter.hit('ip', '3 per minute')[0]
+    assert not limiter.hit('ip', '3 per minute')[0]
+
+    # Refill is capped at the bucket capacity
+    clock.now += 3600
+    for _ in range(3):
+        assert limiter.hit('ip', '3 per minute')[0]
+    assert not limiter.hit('ip', '3 per minute')[0]
+
+
+def test_keys_are_independent(clock):
+    limiter = RateLimiter(shards=4, overrides={})
+    assert limiter.hit('a', '1 per minute')[0]
+    assert not limiter.hit('a', '1 per minute')[0]
+    assert limiter.hit('b', '1 per minute')[0]
+
+
+def test_idle_keys_are_evicted(clock):
+    limiter = RateLimiter(shards=1, idle_ttl=60, overrides={})
+    for i in range(10):
+        limiter.hit(f'ip-{i}', '10 per minute')
+    assert limiter.size() == 10
+
+    clock.now += 61
+    limiter.hit('new', '10 per minute')
+    assert limiter.size() == 1
+
+
+def test_idle_eviction_waits_for_full_refill(clock):
+    limiter = RateLimiter(shards=1, idle_ttl=600, overrides={})
+    for _ in range(5):
+        assert limiter.hit('ip', '5 per hour')[0]
+
+    # Ocioso além de idle_ttl, mas o bucket só teria 1 token de volta
+    clock.now += 1000
+    limiter.hit('other', '5 per hour')
+    assert limiter.size() == 2
+    assert limiter.hit('ip', '5 per hour')[0]
+    assert not limiter.hit('ip', '5 per hour')[0]
+
+    clock.now += 3601
+    limiter.hit('new', '5 per hour')
+    assert limiter.size() == 1
+
+
+def test_max_keys_evicts_least_recently_used(clock):
+    limiter = RateLimiter(shards=1, max_keys=3, overrides={})
+    for key in ('a', 'b', 'c'):
+        limiter.hit(key, '1 per minute')
+    limiter.hit('a', '1 per minute')  # 'a' passa a ser o mais recente
+
+    limiter.hit('d', '1 per minute')
+    assert limiter.size() == 3
+    # 'b' foi removido: volta com o bucket cheio
+    assert limiter.hit('b', '1 per minute')[0]
+    # 'a' continua no limite
+    assert not limiter.hit('a', '1 per minute')[0]
+
+
+def test_shard_count_is_power_of_two():
+    assert RateLimiter(shards=1, overrides={}).num_shards == 1
+    assert RateLimiter(shards=48, overrides={}).num_shards == 64
+
+
+def test_limit_decorator_returns_429(clock):
+    app = Flask(__name__)
+    limiter = RateLimiter(shards=4, overrides={'ping': '1 per minute'})
+
+    @app.route('/ping')
+    @limiter.limit('100 per minute')
+    def ping():
+        return 'pong'
+
+    client = app.test_client()
+    assert client.get('/ping').status_code == 200
+
+    response = client.get('/ping')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '60'
+    assert response.get_json()['error'] == 'rate_limited'
@@ -21,10 +21,29 @@ class Config:
     # Câmeras
     MAX_CAMERAS = int(os.getenv('MAX_CAMERAS', '5'))
     RTSP_TIMEOUT = 10
+    CLUSTER_MODE = os.getenv('CLUSTER_MODE', 'False') == 'True'  # Leases de câmeras entre nós
+    CLUSTER_LEASE_TTL = int(os.getenv('CLUSTER_LEASE_TTL', '30'))
+    CLUSTER_NODE_TTL = int(os.getenv('CLUSTER_NODE_TTL', '3600'))  # Remove nós sem heartbeat
+    LATENCY_TARGET_MS = int(os.getenv('LATENCY_TARGET_MS', '500'))  # Alvo do controle adaptativo
+    
+    # Arquivo histórico (Parquet)
+    ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', 'False') == 'True'
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive/detections')
+    ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '7'))
+    
+    # Clipes pré/pós-evento
+    CLIP_DIR = os.getenv('CLIP_DIR', 'clips')
+    CLIP_PRE_SECONDS = 5
+    CLIP_POST_SECONDS = 5
+    CLIP_MEMORY_MB = int(os.getenv('CLIP_MEMORY_MB', '256'))  # Teto global dos buffers
+    CLIP_RETENTION_DAYS = float(os.getenv('CLIP_RETENTION_DAYS', '30'))
     
     # IA
     AI_MODEL_PATH = os.path.join(BASE_DIR, 'ai_models')
     DETECTION_THRESHOLD = 0.7
+    CASCADE_MODE = os.getenv('CASCADE_MODE', 'False') == 'True'  # yolov8n -> yolov8m sob demanda
+    CASCADE_ESCALATION_CONF = float(os.getenv('CASCADE_ESCALATION_CONF', '0.5'))
+    CASCADE_MAX_BOXES = int(os.getenv('CASCADE_MAX_BOXES', '4'))  # Recortes yolov8m por quadro
 
 class DevelopmentConfig(Config):
     DEBUG = True
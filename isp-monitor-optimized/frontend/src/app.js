@@ -9,12 +9,18 @@ const activeCamerasElement = document.getElementById('active-cameras');
 const detectedVehiclesElement = document.getElementById('detected-vehicles');
 const todayAlertsElement = document.getElementById('today-alerts');
 
+// Estado incremental do dashboard
+const DASHBOARD_INTERVAL = 5000;
+const MAX_DETECTION_ROWS = 5;
+let dashboardCursor = null;
+let dashboardPolling = false;
+
 // Inicialização
 document.addEventListener('DOMContentLoaded', () => {
     checkAuth();
-    loadCameras();
-    loadRecentDetections();
-    startStatusUpdates();
+    pollDashboard();
+    setInterval(pollDashboard, DASHBOARD_INTERVAL);
+    startAlertStream();
 });
 
 // Funções de Autenticação
@@ -24,112 +30,132 @@ async function checkAuth() {
     }
 }
 
-// Carrega câmeras ativas
-async function loadCameras() {
+// Busca apenas o que mudou desde o último cursor (304 quando nada mudou).
+// Uma consulta por vez: o intervalo e a continuação de respostas truncadas
+// nunca se sobrepõem (evita linhas duplicadas)
+async function pollDashboard() {
+    if (dashboardPolling) return;
+    dashboardPolling = true;
     try {
-        const response = await fetch(`${API_BASE_URL}/api/cameras`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
-        
-        if (!response.ok) throw new Error('Erro ao carregar câmeras');
-        
-        const cameras = await response.json();
-        renderCameras(cameras);
-        activeCamerasElement.textContent = cameras.length;
+        // Mais mudanças pendentes do que cabem numa resposta: busca o resto já
+        while (await fetchDashboard()) {}
+    } finally {
+        dashboardPolling = false;
+    }
+}
+
+// Retorna true se a resposta veio truncada
+async function fetchDashboard() {
+    try {
+        const headers = { 'Authorization': `Bearer ${authToken}` };
+        let url = `${API_BASE_URL}/api/dashboard`;
+        if (dashboardCursor) {
+            headers['If-None-Match'] = `"${dashboardCursor}"`;
+            url += `?cursor=${encodeURIComponent(dashboardCursor)}`;
+        }
+
+        const response = await fetch(url, { headers });
+        setSystemStatus(true);
+        if (response.status === 304) return false;
+        if (!response.ok) throw new Error('Erro ao carregar dashboard');
+
+        const data = await response.json();
+        applyDashboard(data);
+        return data.truncated;
     } catch (error) {
+        setSystemStatus(false);
         console.error('Erro:', error);
+        return false;
     }
 }
 
-// Renderiza as câmeras na grade
-function renderCameras(cameras) {
-    cameraGrid.innerHTML = '';
-    
-    cameras.forEach(camera => {
-        const cameraCard = document.createElement('div');
+function setSystemStatus(online) {
+    const status = document.getElementById('system-status');
+    status.textContent = online ? 'Online' : 'Offline';
+    status.className = `mt-2 text-3xl font-semibold ${online ? 'text-green-500' : 'text-red-500'}`;
+}
+
+// Aplica snapshot ou deltas no DOM existente, sem recriar a grade
+function applyDashboard(data) {
+    dashboardCursor = data.cursor;
+
+    if (data.full) {
+        cameraGrid.innerHTML = '';
+        detectionsTable.innerHTML = '';
+    }
+
+    data.cameras.forEach(upsertCamera);
+    data.detections.forEach(prependDetection);
+
+    if (data.full) {
+        activeCamerasElement.textContent = data.counters.active_cameras;
+        detectedVehiclesElement.textContent = data.counters.detections;
+        todayAlertsElement.textContent = data.counters.today_alerts;
+    } else {
+        activeCamerasElement.textContent = cameraGrid.children.length;
+        addToCounter(detectedVehiclesElement, data.counters_delta.detections);
+        addToCounter(todayAlertsElement, data.counters_delta.isp_alerts);
+    }
+}
+
+function addToCounter(element, delta) {
+    element.textContent = (parseInt(element.textContent) || 0) + delta;
+}
+
+// Cria ou atualiza o card de uma câmera
+function upsertCamera(camera) {
+    let cameraCard = cameraGrid.querySelector(`[data-camera-id="${CSS.escape(camera.camera_id)}"]`);
+
+    if (!cameraCard) {
+        cameraCard = document.createElement('div');
         cameraCard.className = 'camera-feed bg-gray-800 rounded-lg overflow-hidden relative';
-        
+        cameraCard.dataset.cameraId = camera.camera_id;
         cameraCard.innerHTML = `
-            <div class="absolute top-2 left-2 bg-black bg-opacity-50 text-white px-2 py-1 rounded text-sm">
-                ${camera.location}
-            </div>
-            <img src="${camera.rtsp_url}" alt="Feed da Câmera" class="w-full h-full object-cover">
+            <div class="camera-location absolute top-2 left-2 bg-black bg-opacity-50 text-white px-2 py-1 rounded text-sm"></div>
+            <img alt="Feed da Câmera" class="w-full h-full object-cover">
             <div class="absolute bottom-2 left-2 flex space-x-2">
-                <span class="bg-red-500 text-white text-xs px-2 py-1 rounded-full">Live</span>
-                <span class="bg-blue-500 text-white text-xs px-2 py-1 rounded-full">${camera.id}</span>
+                <span class="camera-status bg-red-500 text-white text-xs px-2 py-1 rounded-full">Live</span>
+                <span class="bg-blue-500 text-white text-xs px-2 py-1 rounded-full">${camera.camera_id}</span>
             </div>
         `;
-        
         cameraGrid.appendChild(cameraCard);
-    });
-}
-
-// Carrega detecções recentes
-async function loadRecentDetections() {
-    try {
-        const response = await fetch(`${API_BASE_URL}/api/detections?limit=5`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
-        
-        if (!response.ok) throw new Error('Erro ao carregar detecções');
-        
-        const detections = await response.json();
-        renderDetections(detections);
-        detectedVehiclesElement.textContent = detections.length;
-    } catch (error) {
-        console.error('Erro:', error);
     }
-}
 
-// Renderiza as detecções na tabela
-function renderDetections(detections) {
-    detectionsTable.innerHTML = '';
-    
-    detections.forEach(detection => {
-        const row = document.createElement('tr');
-        
-        row.innerHTML = `
-            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                ${detection.camera_id}
-            </td>
-            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                ${new Date(detection.timestamp).toLocaleString()}
-            </td>
-            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full bg-red-100 text-red-800">
-                    Veículo ISP
-                </span>
-            </td>
-            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                <img src="${detection.image_url}" alt="Detecção" class="h-12 w-auto rounded">
-            </td>
-        `;
-        
-        detectionsTable.appendChild(row);
-    });
+    cameraCard.querySelector('.camera-location').textContent = camera.location || '';
+    const feed = cameraCard.querySelector('img');
+    if (feed.getAttribute('src') !== camera.rtsp_url) feed.src = camera.rtsp_url;
+    cameraCard.querySelector('.camera-status').textContent = camera.is_active === false ? 'Offline' : 'Live';
 }
 
-// Atualiza status e verifica alertas
-function startStatusUpdates() {
-    // Verificação de saúde do sistema
-    setInterval(async () => {
-        try {
-            const response = await fetch(`${API_BASE_URL}/health`);
-            if (response.ok) {
-                document.getElementById('system-status').textContent = 'Online';
-                document.getElementById('system-status').className = 'mt-2 text-3xl font-semibold text-green-500';
-            }
-        } catch (error) {
-            document.getElementById('system-status').textContent = 'Offline';
-            document.getElementById('system-status').className = 'mt-2 text-3xl font-semibold text-red-500';
-        }
-    }, 5000);
+// Insere uma detecção no topo da tabela, mantendo as últimas linhas
+function prependDetection(detection) {
+    const row = document.createElement('tr');
+
+    row.innerHTML = `
+        <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
+            ${detection.camera_id}
+        </td>
+        <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
+            ${new Date(detection.timestamp).toLocaleString()}
+        </td>
+        <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
+            <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full bg-red-100 text-red-800">
+                Veículo ISP
+            </span>
+        </td>
+        <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
+            <img src="${detection.image_url || ''}" alt="Detecção" class="h-12 w-auto rounded">
+        </td>
+    `;
+
+    detectionsTable.prepend(row);
+    while (detectionsTable.children.length > MAX_DETECTION_ROWS) {
+        detectionsTable.lastElementChild.remove();
+    }
+}
 
-    // Conexão SSE para alertas em tempo real
+// Conexão SSE para alertas em tempo real
+function startAlertStream() {
     const eventSource = new EventSource(`${API_BASE_URL}/api/alerts`);
 
     eventSource.onmessage = (event) => {
@@ -144,7 +170,7 @@ function startStatusUpdates() {
     eventSource.onerror = () => {
         console.error('Erro na conexão SSE');
         eventSource.close();
-        setTimeout(startStatusUpdates, 5000);
+        setTimeout(startAlertStream, 5000);
     };
 }
 
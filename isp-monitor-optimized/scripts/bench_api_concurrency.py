@@ -0,0 +1,133 @@
+"""Benchmark de concorrência: Flask threaded (app_fixed) vs ASGI (app_async).
+
+Abre N conexões SSE ociosas em /api/alerts e, com elas abertas, mede a
+latência e a vazão de /health. Com --pid também reporta threads e RSS do
+processo servidor (Linux).
+
+No Flask cada conexão SSE ocupa uma thread que consulta o MongoDB a cada
+ALERT_POLL_INTERVAL; no ASGI as conexões só esperam numa fila do poller
+compartilhado. Números do Flask medidos antes da correção do handler de
+/api/alerts (que falhava ~0.5 s após conectar) não são comparáveis.
+
+Exemplo:
+    python backend/api/app_fixed.py                      # porta 8000
+    uvicorn app_async:app --port 8001                    # em backend/api
+    python scripts/bench_api_concurrency.py \
+        --target flask=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 \
+        --sse 1000 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlparse
+
+
+def read_proc_status(pid):
+    """Retorna (threads, rss_mb) do processo, ou (None, None)"""
+    if not pid:
+        return None, None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+    except (OSError, KeyError):
+        return None, None
+
+
+async def open_sse(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                 "Accept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readline()  # status line
+    return writer
+
+
+async def timed_get(host, port, path):
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                 "Connection: close\r\n\r\n".encode())
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    return time.perf_counter() - started
+
+
+async def run_target(name, url, args):
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+
+    sse_writers = []
+    failed_sse = 0
+    for _ in range(args.sse):
+        try:
+            sse_writers.append(await open_sse(host, port, '/api/alerts'))
+        except OSError:
+            failed_sse += 1
+    await asyncio.sleep(1)
+    threads, rss = read_proc_status(args.pid.get(name))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            try:
+                latencies.append(await timed_get(host, port, '/health'))
+            except OSError:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    for writer in sse_writers:
+        writer.close()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    return {
+        'target': name,
+        'sse_open': len(sse_writers),
+        'sse_failed': failed_sse,
+        'req_per_s': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': pct(0.99) if latencies else None,
+        'errors': errors,
+        'threads': threads,
+        'rss_mb': rss
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True,
+                        help='nome=url, pode repetir')
+    parser.add_argument('--pid', action='append', default=[],
+                        help='nome=pid do servidor para medir threads/RSS')
+    parser.add_argument('--sse', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    args.pid = dict(item.split('=', 1) for item in args.pid)
+
+    results = []
+    for target in args.target:
+        name, url = target.split('=', 1)
+        results.append(asyncio.run(run_target(name, url, args)))
+
+    columns = ['target', 'sse_open', 'sse_failed', 'req_per_s', 'p50_ms',
+               'p99_ms', 'errors', 'threads', 'rss_mb']
+    print(' '.join(f'{c:>10}' for c in columns))
+    for r in results:
+        print(' '.join(f'{r[c]:>10.1f}' if isinstance(r[c], float) else f'{str(r[c]):>10}'
+                       for c in columns))
+
+
+if __name__ == '__main__':
+    main()
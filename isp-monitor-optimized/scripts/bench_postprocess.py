@@ -0,0 +1,71 @@
+"""Benchmark do pós-processamento YOLO por quadro em cenas lotadas.
+
+Compara o laço antigo (int(box.cls), float(box.conf), box.xyxy[0] por caixa,
+montando dicts) com VehicleDetectionUtils.to_records (uma cópia do tensor
+para NumPy por quadro). Usa Boxes reais do ultralytics com dados sintéticos.
+
+    python scripts/bench_postprocess.py --boxes 20 100 300 --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import torch
+from ultralytics.engine.results import Boxes
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from ai_models.vehicle_detection_utils import VehicleDetectionUtils
+
+CLASSES = [2, 3, 5, 7]
+
+
+def make_results(num_boxes, device):
+    xy = torch.rand(num_boxes, 2) * 1800
+    wh = torch.rand(num_boxes, 2) * 200 + 20
+    conf = torch.rand(num_boxes, 1)
+    cls = torch.tensor(CLASSES)[torch.randint(0, 4, (num_boxes,))].float().unsqueeze(1)
+    data = torch.cat([xy, xy + wh, conf, cls], dim=1).to(device)
+    return [SimpleNamespace(boxes=Boxes(data, (1080, 1920)))]
+
+
+def legacy(results):
+    vehicles = []
+    for result in results:
+        for box in result.boxes:
+            if int(box.cls) in CLASSES:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                vehicles.append({
+                    'bbox': [x1, y1, x2, y2],
+                    'confidence': float(box.conf),
+                    'class_id': int(box.cls)
+                })
+    return vehicles
+
+
+def bench(fn, results, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(results)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--boxes', type=int, nargs='+', default=[10, 50, 150, 300])
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    print(f"device={args.device}")
+    print(f"{'boxes':>6} {'legacy_ms':>10} {'records_ms':>11} {'speedup':>8}")
+    for num_boxes in args.boxes:
+        results = make_results(num_boxes, args.device)
+        old = bench(legacy, results, args.repeat)
+        new = bench(VehicleDetectionUtils.to_records, results, args.repeat)
+        print(f"{num_boxes:>6} {old:>10.3f} {new:>11.3f} {old / new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark de vazão do RateLimiter sob contenção de threads.
+
+Compara 1 shard (lock global) com N shards, com várias threads batendo em
+um conjunto de chaves (IPs/usuários sintéticos).
+
+    python scripts/bench_rate_limit.py --threads 1 8 32 --keys 10000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'api'))
+from rate_limit import RateLimiter
+
+
+def run(limiter, threads, keys, ops_per_thread):
+    key_names = [f"get_detections:10.0.{i // 256}.{i % 256}" for i in range(keys)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        picks = [rng.choice(key_names) for _ in range(1024)]
+        barrier.wait()
+        for i in range(ops_per_thread):
+            limiter.hit(picks[i & 1023], '100 per minute')
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return threads * ops_per_thread / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--ops', type=int, default=50000, help='operações por thread')
+    parser.add_argument('--shards', type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'1 shard ops/s':>15} {f'{args.shards} shards ops/s':>17} {'keys':>7}")
+    for threads in args.threads:
+        single = RateLimiter(shards=1, overrides={})
+        sharded = RateLimiter(shards=args.shards, overrides={})
+        a = run(single, threads, args.keys, args.ops)
+        b = run(sharded, threads, args.keys, args.ops)
+        print(f"{threads:>8} {a:>15,.0f} {b:>17,.0f} {sharded.size():>7}")
+
+
+if __name__ == '__main__':
+    main()
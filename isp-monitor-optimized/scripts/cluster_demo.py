@@ -0,0 +1,102 @@
+"""Demonstração local do modo cluster (vários processos, um MongoDB local).
+
+Sobe um mongod temporário (ou usa --mongo-uri), cadastra câmeras fictícias,
+inicia N nós de coordenação (backend/api/cluster.py, sem inferência), mata
+um nó e depois adiciona outro, imprimindo a distribuição dos leases.
+
+    python scripts/cluster_demo.py --nodes 3 --cameras 10
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from pymongo import MongoClient
+
+API_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'api')
+
+
+def start_mongod(port):
+    if not shutil.which('mongod'):
+        sys.exit("mongod não encontrado; use --mongo-uri para um MongoDB existente")
+    dbpath = tempfile.mkdtemp(prefix='isp-cluster-')
+    proc = subprocess.Popen(['mongod', '--dbpath', dbpath, '--port', str(port),
+                             '--bind_ip', '127.0.0.1'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(2)
+    return proc, dbpath
+
+
+def start_node(name, uri, ttl, interval, max_cameras):
+    env = dict(os.environ, MONGO_URI=uri)
+    return subprocess.Popen(
+        [sys.executable, 'cluster.py', '--node-id', name, '--ttl', str(ttl),
+         '--interval', str(interval), '--max-cameras', str(max_cameras)],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def show(db, label):
+    owners = Counter(c.get('lease_owner') for c in db.cameras.find({}, {'lease_owner': 1}))
+    print(f"{label:<28} " + ', '.join(f"{k or 'livre'}={v}" for k, v in sorted(
+        owners.items(), key=lambda item: str(item[0]))), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri')
+    parser.add_argument('--port', type=int, default=27018)
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--cameras', type=int, default=10)
+    parser.add_argument('--max-cameras', type=int, default=5)
+    parser.add_argument('--ttl', type=int, default=6)
+    parser.add_argument('--interval', type=int, default=2)
+    args = parser.parse_args()
+
+    mongod = None
+    uri = args.mongo_uri
+    if not uri:
+        mongod, dbpath = start_mongod(args.port)
+        uri = f'mongodb://127.0.0.1:{args.port}/'
+
+    db = MongoClient(uri)['isp_vehicle_detection']
+    db.cameras.delete_many({})
+    db.nodes.delete_many({})
+    db.cameras.insert_many([{
+        'camera_id': f'cam-{i}',
+        'rtsp_url': f'rtsp://example/{i}',
+        'priority': 1 + i % 3
+    } for i in range(args.cameras)])
+
+    nodes = {f'node-{i}': start_node(f'node-{i}', uri, args.ttl, args.interval,
+                                     args.max_cameras)
+             for i in range(args.nodes)}
+    settle = args.ttl + 2 * args.interval
+    try:
+        time.sleep(settle)
+        show(db, 'inicial')
+
+        victim = sorted(nodes)[0]
+        nodes.pop(victim).kill()  # sem liberar leases: simula queda
+        show(db, f'{victim} morto')
+        time.sleep(settle)
+        show(db, 'após expiração do lease')
+
+        name = f'node-{args.nodes}'
+        nodes[name] = start_node(name, uri, args.ttl, args.interval, args.max_cameras)
+        time.sleep(settle)
+        show(db, f'{name} entrou')
+    finally:
+        for proc in nodes.values():
+            proc.terminate()
+        if mongod:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()